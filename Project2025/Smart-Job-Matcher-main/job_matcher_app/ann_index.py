@@ -0,0 +1,92 @@
+# ann_index.py
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+
+# Rows assigned to clusters per block while building, bounds the dense scratch space
+_BLOCK_ROWS = 8192
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def _assign(matrix, centroids):
+    """Nearest centroid (by cosine) of every row, computed block by block"""
+    assignments = np.empty(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], _BLOCK_ROWS):
+        block = matrix[start:start + _BLOCK_ROWS]
+        assignments[start:start + block.shape[0]] = np.asarray(block @ centroids.T).argmax(axis=1)
+    return assignments
+
+
+class IVFIndex:
+    """Inverted-file index for approximate nearest-neighbour retrieval.
+
+    Job vectors are grouped with spherical k-means; a query is compared with
+    the cluster centroids only and the jobs of the `nprobe` closest clusters
+    are returned as candidates, to be re-scored exactly by the caller. More
+    probes give better recall for more latency.
+    """
+
+    def __init__(self, centroids, assignments):
+        self.centroids = centroids
+        self.n_rows = len(assignments)
+
+        # Rows of each cluster, stored contiguously
+        self._order = np.argsort(assignments, kind='stable')
+        self._offsets = np.searchsorted(assignments[self._order], np.arange(len(centroids) + 1))
+
+        # Rows added after the build
+        self._added = defaultdict(list)
+
+    @classmethod
+    def build(cls, matrix, n_clusters=None, n_iter=10, seed=0):
+        """Cluster the L2-normalised rows of a sparse matrix"""
+        matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+        n_rows = matrix.shape[0]
+        if n_clusters is None:
+            n_clusters = int(np.sqrt(n_rows))
+        n_clusters = max(1, min(n_clusters, n_rows))
+
+        rng = np.random.default_rng(seed)
+        centroids = _normalize(matrix[rng.choice(n_rows, n_clusters, replace=False)].toarray())
+
+        for _ in range(n_iter):
+            assignments = _assign(matrix, centroids)
+
+            # New centroid = normalised sum of the member rows
+            members = sparse.csr_matrix(
+                (np.ones(n_rows, dtype=np.float32), (assignments, np.arange(n_rows))),
+                shape=(n_clusters, n_rows)
+            )
+            sums = (members @ matrix).toarray()
+
+            # Reseed clusters that lost all their members
+            empty = ~sums.any(axis=1)
+            if empty.any():
+                sums[empty] = matrix[rng.choice(n_rows, int(empty.sum()), replace=False)].toarray()
+
+            centroids = _normalize(sums)
+
+        return cls(centroids, _assign(matrix, centroids))
+
+    def add(self, row, vector):
+        """Assign a row appended after the build to its nearest cluster"""
+        vector = sparse.csr_matrix(vector, dtype=np.float32)
+        cluster = int(np.asarray(vector @ self.centroids.T).argmax())
+        self._added[cluster].append(row)
+
+    def candidates(self, query, nprobe):
+        """Rows of the `nprobe` clusters closest to a dense query vector"""
+        scores = self.centroids @ query.astype(np.float32)
+        nprobe = min(nprobe, len(scores))
+        clusters = np.argpartition(-scores, nprobe - 1)[:nprobe]
+
+        rows = [self._order[self._offsets[cluster]:self._offsets[cluster + 1]] for cluster in clusters]
+        rows.extend(np.array(self._added[cluster], dtype=np.int64)
+                    for cluster in clusters if cluster in self._added)
+        return np.concatenate(rows)
@@ -1,23 +1,26 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
 import os
-import matplotlib.pyplot as plt
-import base64
-from io import BytesIO
-import io
 from datetime import datetime
 from dotenv import load_dotenv
-from PyPDF2 import PdfReader
-from werkzeug.utils import secure_filename
-
-# For CV parsing
-import fitz  # PyMuPDF for PDFs
-from docx import Document  # python-docx for DOCX
+from sqlalchemy import inspect, text
 
 # Database models
-from models import db, User, UserSkill, Job, JobMatch
+from models import db, User, Job, MatchTask
 
 # Enhanced matching algorithm
-from matching_algorithm import EnhancedMatcher
+from matching_algorithm import EnhancedMatcher, match_summary
+from match_queue import MatchQueue, QueueFull
+from cv_extraction import CVExtractor, CVTooLarge
+from match_cache import MatchCache, CVEntry, cv_key
+from match_history import HistoryWriter, history_page, user_stats
+from job_index import watch_job_changes
+from skill_taxonomy import default_taxonomy, taxonomy_version
+from charts import ChartCache, skills_gap_params
+from index_snapshot import IndexSnapshots
+from ingest_jobs import JobFileWatcher, refresh_index
+from job_index import parse_skills
+from candidate_index import CandidateIndex
+from user_skills import normalize_skill, skill_ids, sync_user_skills
 
 # Load environment variables
 load_dotenv()
@@ -29,48 +32,96 @@ app.secret_key = os.getenv('SECRET_KEY', 'your_secret_key_here')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI', 'sqlite:///jobmatcher.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Matching configuration: how many results to keep and the lowest score shown
+app.config['MATCH_TOP_K'] = int(os.getenv('MATCH_TOP_K', 10))
+app.config['MATCH_MIN_SCORE'] = float(os.getenv('MATCH_MIN_SCORE', 0))
+
+# Background matching: uploads get a ticket and are matched on a process pool
+app.config['MATCH_ASYNC'] = os.getenv('MATCH_ASYNC', 'False').lower() == 'true'
+app.config['MATCH_WORKERS'] = int(os.getenv('MATCH_WORKERS', 2))
+app.config['MATCH_QUEUE_SIZE'] = int(os.getenv('MATCH_QUEUE_SIZE', 16))
+
+# CV uploads: byte, page and time limits for text extraction
+app.config['CV_MAX_BYTES'] = int(os.getenv('CV_MAX_BYTES', 5 * 1024 * 1024))
+app.config['CV_MAX_PAGES'] = int(os.getenv('CV_MAX_PAGES', 20))
+app.config['CV_EXTRACT_TIMEOUT'] = float(os.getenv('CV_EXTRACT_TIMEOUT', 15))
+app.config['CV_EXTRACT_WORKERS'] = int(os.getenv('CV_EXTRACT_WORKERS', 2))
+app.config['MAX_CONTENT_LENGTH'] = app.config['CV_MAX_BYTES'] + 64 * 1024  # Room for the form fields
+
+# Cache of CV analyses and scores keyed by the uploaded bytes. It is kept in
+# memory only unless MATCH_CACHE_DIR is set: the entries hold the CVs' text,
+# which is personal data, so persisting them is opt-in
+app.config['MATCH_CACHE_BYTES'] = int(os.getenv('MATCH_CACHE_BYTES', 64 * 1024 * 1024))
+app.config['MATCH_CACHE_DIR'] = os.getenv('MATCH_CACHE_DIR', '')
+
+# Job index snapshots memory-mapped by every worker; empty to fit the index per worker
+app.config['MATCH_SNAPSHOT_DIR'] = os.getenv('MATCH_SNAPSHOT_DIR', os.path.join(app.instance_path, 'index_snapshot'))
+
+# Match history: how many results of an upload are kept (0 = all), the lowest
+# score kept, and whether rows are written in batches off the request thread
+app.config['MATCH_HISTORY_LIMIT'] = int(os.getenv('MATCH_HISTORY_LIMIT', 0))
+app.config['MATCH_HISTORY_MIN_SCORE'] = float(os.getenv('MATCH_HISTORY_MIN_SCORE', 0))
+app.config['MATCH_HISTORY_WRITE_BEHIND'] = os.getenv('MATCH_HISTORY_WRITE_BEHIND', 'False').lower() == 'true'
+app.config['HISTORY_PAGE_SIZE'] = int(os.getenv('HISTORY_PAGE_SIZE', 20))
+
+# Optional hand-edited JSON job file, loaded into the jobs table whenever it changes
+app.config['JOBS_JSON_PATH'] = os.getenv('JOBS_JSON_PATH', os.path.join(os.path.dirname(__file__), "jobs.json"))
+
+# Candidate ranking for employers: seconds before the skill -> users index is
+# reloaded to pick up other workers' profile edits (0 = never)
+app.config['CANDIDATE_INDEX_TTL'] = float(os.getenv('CANDIDATE_INDEX_TTL', 300))
+
+# Comma-separated emails of the users init_db gives the admin role, which is
+# needed to see a job's candidates; nobody has it by default
+app.config['ADMIN_EMAILS'] = {email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',')
+                              if email.strip()}
+
 # Initialize database
 db.init_app(app)
 
 # Initialize the enhanced matcher
 matcher = EnhancedMatcher()
-print("Available methods in matcher:", [method for method in dir(matcher) if not method.startswith('_')])
-import json
-import os
-import os
-import json
-
-def load_jobs():
-    jobs_path = os.path.join(os.path.dirname(__file__), "jobs.json")
 
-    if not os.path.exists(jobs_path):
-        return []
+# Re-uploads of the same CV skip extraction and, until the job index changes, scoring
+match_cache = MatchCache(app.config['MATCH_CACHE_BYTES'], app.config['MATCH_CACHE_DIR'] or None,
+                         version=taxonomy_version())
+matcher.cache = match_cache
 
-    with open(jobs_path, "r") as f:
-        return json.load(f)
+# Workers map the latest saved job index instead of fitting their own
+if app.config['MATCH_SNAPSHOT_DIR']:
+    matcher.snapshots = IndexSnapshots(app.config['MATCH_SNAPSHOT_DIR'])
 
-def smart_match(job, user_keywords, user_location):
-    score = 0
-  # Skill match
+# Keep the matcher's job index in step with Job inserts, edits and deletes
+watch_job_changes(db.session, Job, matcher.update_index)
 
-    job_skills = job["required_skills"].lower().split(",")
+# Background matching queue, finished matches are saved by save_matches
+match_queue = MatchQueue()
 
-    for skill in user_keywords:
-        if skill.lower() in job_skills:
-            score += 30
+# CV text extraction on its own process pool
+cv_extractor = CVExtractor(app)
 
-    return min(score, 100)
+# Bulk (optionally write-behind) persistence of the match history
+history_writer = HistoryWriter(app)
 
+# Charts are served from their own URLs and rendered once per skills vector
+chart_cache = ChartCache()
 
-    # Location match
-    if user_location.lower() in job["location"].lower():
-        score += 20
+# Jobs of the JSON file join the database catalog the matcher indexes
+job_file = JobFileWatcher(app.config['JOBS_JSON_PATH'], source="jobs.json")
 
-    # Title relevance
-    if any(word.lower() in job["title"].lower() for word in user_keywords):
-        score += 50
+# Users by skill, so the candidates of a job are found without scanning every user
+candidate_index = CandidateIndex(app.config['CANDIDATE_INDEX_TTL'] or None, app=app)
+import json
+import os
+import os
+import json
 
-    return score
+def load_jobs():
+    """Jobs of the indexed catalog, after picking up changes to the JSON job file"""
+    if job_file.check() and matcher.job_index is not None:
+        # The file is ingested with bulk SQL, refit once instead of per job
+        refresh_index(matcher)
+    return ensure_job_index().live_records()
 
 # -------------------- ROUTES --------------------
 
@@ -146,30 +197,49 @@ def index():
     matched_jobs = []
     skills_gap_image = None
     
-    # Get user stats
-    total_matches = JobMatch.query.filter_by(user_id=user.id).count()
-    recent_matches = JobMatch.query.filter_by(user_id=user.id).order_by(JobMatch.matched_on.desc()).limit(5).all()
+    # Get user stats, kept up to date as matches are saved
+    stats = user_stats(user.id)
     
     if request.method == "POST":
         keyword = request.form.get("keyword", "").lower()
         location = request.form.get("location", "").lower()
+        top_k = request.form.get("top_k", app.config['MATCH_TOP_K'], type=int)
         cv_file = request.files.get("cv")
         
+        if cv_file and cv_file.filename and app.config['MATCH_ASYNC']:
+            # Hand the upload to the background queue and let the client poll for it
+            ensure_job_index()
+            try:
+                ticket = match_queue.submit(user.id, cv_extractor.read_upload(cv_file), cv_file.filename,
+                                            keyword, location, top_k, app.config['MATCH_MIN_SCORE'])
+            except CVTooLarge as e:
+                flash(str(e), "warning")
+                return redirect(url_for("index"))
+            except QueueFull:
+                flash("The matcher is busy right now. Please try again in a moment.", "warning")
+                return render_template("index.html",
+                                       matched_jobs=matched_jobs,
+                                       skills_gap_image=skills_gap_image,
+                                       user=user,
+                                       stats=stats), 503
+            return redirect(url_for("match_task", ticket=ticket))
+        
         if cv_file and cv_file.filename:
             print(f"Processing CV file: {cv_file.filename}")
-            cv_text = extract_cv_text(cv_file)
+            try:
+                key, cv = analyse_cv(cv_extractor.read_upload(cv_file), cv_file.filename)
+            except CVTooLarge as e:
+                flash(str(e), "warning")
+                return redirect(url_for("index"))
+            cv_text = cv.text
             print(f"Extracted text length: {len(cv_text)} characters")
             
-            # Check what jobs are available
-            all_jobs = Job.query.all()
-            print(f"Available jobs in database: {len(all_jobs)}")
-            for job in all_jobs:
-                print(f"Job: {job.title}, Skills: {job.required_skills}")
-            
             if not cv_text.strip():
                 flash("Could not extract text from the CV file. Please try a different file format.", "warning")
             else:
-                matched_jobs = match_jobs(cv_text, keyword, location, user)
+                matched_jobs = match_jobs(cv_text, keyword, location, user, top_k=top_k,
+                                          processed_cv=cv.processed, cv_skills=cv.skills, cv_key=key,
+                                          cv_filename=cv_file.filename)
                 print(f"Found {len(matched_jobs)} matching jobs")
                 
                 if matched_jobs:
@@ -190,28 +260,41 @@ def index():
                          matched_jobs=matched_jobs, 
                          skills_gap_image=skills_gap_image,
                          user=user,
-                         total_matches=total_matches,
-                         recent_matches=recent_matches)
-@app.route('/match', methods=['POST'])
-def match():
-    keywords = request.form.get("keywords").lower().split(",")
-    location = request.form.get("location").lower().split(",")
+                         stats=stats)
 
-    jobs = load_jobs()  # your job list
+@app.route("/tasks/<ticket>")
+def match_task(ticket):
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    
+    task = MatchTask.query.filter_by(id=ticket, user_id=session["user_id"]).first_or_404()
+    
+    if task.status == "done" and task.result:
+        session["matched_results"] = json.loads(task.result)
+    
+    if request.args.get("format") == "json":
+        return jsonify(task.to_dict())
+    
+    return render_template("task.html", task=task.to_dict())
 
-    matched_jobs = []
+@app.route('/match', methods=['POST'])
+def match():
+    keywords = [keyword.strip() for keyword in request.form.get("keywords", "").lower().split(",")
+                if keyword.strip()]
+    location = request.form.get("location", "").strip().lower()
 
-    for job in jobs:
-        score = smart_match(job, keywords, location)
+    if not keywords:
+        return render_template("results.html", matches=[])
 
-        if score > 30:
-            job["match_score"] = score
-            matched_jobs.append(job)
+    load_jobs()
 
-    # Sort by best match
-    matched_jobs = sorted(matched_jobs, key=lambda x: x["match_score"], reverse=True)
+    # The keywords are scored like a very short CV, by the same matcher as uploads
+    results = matcher.match_jobs(" ".join(keywords), None, location=location or None,
+                                 top_k=app.config['MATCH_TOP_K'], min_score=app.config['MATCH_MIN_SCORE'],
+                                 cv_skills=keywords)
+    matches = [{"title": result["job"].title, "score": result["match_score"]} for result in results]
 
-    return render_template("results.html", jobs=matched_jobs)
+    return render_template("results.html", matches=matches)
 
 
 @app.route("/send_report")
@@ -243,20 +326,15 @@ def profile():
         user.phone = request.form.get("phone", user.phone)
         user.location = request.form.get("location", user.location)
         
-        # Update skills
+        # Update skills, only the ones added or removed are written
         skills = request.form.get("skills", "")
+        new_skills = None
         if skills:
-            # Clear existing skills
-            UserSkill.query.filter_by(user_id=user.id).delete()
-            
-            # Add new skills
-            for skill in skills.split(','):
-                skill = skill.strip()
-                if skill:
-                    user_skill = UserSkill(user_id=user.id, skill_name=skill)
-                    db.session.add(user_skill)
+            new_skills = sync_user_skills(user.id, skills.split(','))
         
         db.session.commit()
+        if new_skills is not None:
+            candidate_index.set_user_skills(user.id, new_skills)
         flash("Profile updated successfully!", "success")
         return redirect(url_for("profile"))
     
@@ -270,169 +348,166 @@ def history():
     if "user_id" not in session:
         return redirect(url_for("login"))
     
-    user = User.query.get(session["user_id"])
-    matches = JobMatch.query.filter_by(user_id=user.id).order_by(JobMatch.matched_on.desc()).all()
-    
-    # Format history for template
-    history = []
-    for match in matches:
-        history.append({
-            "date": match.matched_on.strftime("%Y-%m-%d"),
-            "cv_filename": match.cv_filename or "Uploaded CV",
-            "matches": [{
-                "title": match.job.title,
-                "score": match.match_score
-            }]
-        })
-    
-    return render_template("history.html", history=history)
+    runs, next_cursor = history_page(session["user_id"], request.args.get("before"),
+                                     app.config['HISTORY_PAGE_SIZE'])
+    
+    if request.args.get("format") == "json":
+        for run in runs:
+            run["matched_on"] = run["matched_on"].isoformat()
+        return jsonify({"runs": runs, "next": next_cursor})
+    
+    # Format history for template, one group per upload
+    history = [{
+        "date": run["matched_on"].strftime("%Y-%m-%d"),
+        "cv_filename": run["cv_filename"] or "Uploaded CV",
+        "matches": [{
+            "title": match["title"],
+            "score": match["match_score"]
+        } for match in run["matches"]]
+    } for run in runs]
+    
+    return render_template("history.html", history=history, next_cursor=next_cursor)
+
+@app.route("/jobs/<int:job_id>/candidates")
+def job_candidates(job_id):
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    # Candidates are other users' names and locations
+    if not has_admin_role(session["user_id"]):
+        return jsonify({"error": "Access denied"}), 403
+    
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    top_k = min(request.args.get("top_k", app.config['MATCH_TOP_K'], type=int), 100)
+    min_score = request.args.get("min_score", 0, type=float)
+    
+    # Spellings of the same skill ("js", "javascript") count once
+    job_skills = {}
+    for skill in parse_skills(job.required_skills):
+        key = normalize_skill(skill)
+        if key:
+            job_skills.setdefault(key, skill)
+    
+    # Skills nobody has listed are not in the dictionary, and cannot match anyone
+    ids = skill_ids(job_skills.values())
+    names = {skill_id: name for name, skill_id in ids.items()}
+    unknown = [skill for key, skill in job_skills.items() if key not in ids]
+    
+    candidate_index.ensure_loaded()
+    candidates = candidate_index.top_candidates(ids.values(), top_k, min_score, len(ids) + len(unknown))
+    
+    # Names of the shortlisted users only, in one query
+    users = {}
+    if candidates:
+        users = {user.id: user for user in db.session.query(User.id, User.name, User.location)
+                 .filter(User.id.in_([candidate["user_id"] for candidate in candidates]))}
+    for candidate in candidates:
+        user = users.get(candidate["user_id"])
+        candidate["name"] = user.name if user else None
+        candidate["location"] = user.location if user else None
+        candidate["skills_matched"] = [names[skill_id] for skill_id in candidate["skills_matched"]]
+        candidate["skills_missing"] = [names[skill_id] for skill_id in candidate["skills_missing"]] + unknown
+    
+    return jsonify({"job_id": job.id, "title": job.title, "candidates": candidates})
 
 # -------------------- HELPERS --------------------
 
+def has_admin_role(user_id):
+    """Whether a user was given the admin role (see ensure_admin_role)"""
+    user = db.session.get(User, user_id) if user_id is not None else None
+    return bool(user is not None and user.is_admin)
+
+def ensure_admin_role(emails):
+    """Add the users.is_admin column to older databases and give the role to
+    the users with these emails. Returns the number of users given the role."""
+    columns = {column["name"] for column in inspect(db.engine).get_columns(User.__tablename__)}
+    if "is_admin" not in columns:
+        with db.engine.begin() as connection:
+            connection.execute(text("ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT FALSE"))
+    
+    if not emails:
+        return 0
+    granted = (User.query.filter(db.func.lower(User.email).in_(emails), User.is_admin.isnot(True))
+               .update({User.is_admin: True}, synchronize_session=False))
+    db.session.commit()
+    return granted
+
+def analyse_cv(data, filename):
+    """Returns the content key and CVEntry of an uploaded CV, extracting it only once."""
+    key = cv_key(data)
+    cv = match_cache.get_cv(key)
+    if cv is None:
+        cv_text, processed_cv = cv_extractor.extract(data, filename)
+        cv = CVEntry(cv_text, processed_cv, matcher.extract_skills(cv_text))
+        # Failed extractions (e.g. timeouts) are retried on the next upload
+        if cv_text.strip():
+            match_cache.put_cv(key, cv)
+    return key, cv
+
+def extract_cv(file):
+    """Extracts raw and preprocessed text from an uploaded CV based on file type."""
+    _, cv = analyse_cv(cv_extractor.read_upload(file), file.filename)
+    return cv.text, cv.processed
+
 def extract_cv_text(file):
     """Extracts text from uploaded CV based on file type."""
-    filename = file.filename.lower()
-    file.stream.seek(0) 
+    return extract_cv(file)[0]
 
-    try:
-        if filename.endswith(".pdf"):
-            try:
-                doc = fitz.open(stream=file.read(), filetype="pdf")
-                text = " ".join(page.get_text() for page in doc)
-                print(f"PDF extracted: {len(text)} characters")
-                return text
-            except Exception as e:
-                print(f"PDF read error: {e}")
-                return ""
-        
-        elif filename.endswith(".docx"):
-            try:
-                document = Document(file)
-                text = " ".join([para.text for para in document.paragraphs])
-                print(f"DOCX extracted: {len(text)} characters")
-                return text
-            except Exception as e:
-                print(f"DOCX read error: {e}")
-                return ""
-        
-        elif filename.endswith(".txt"):
-            try:
-                text = file.read().decode("utf-8", errors="ignore")
-                print(f"TXT extracted: {len(text)} characters")
-                return text
-            except Exception as e:
-                print(f"TXT read error: {e}")
-                return ""
-        
-        else:
-            print(f"Unsupported file type: {filename}")
-            return ""
-            
-    except Exception as e:
-        print(f"General file reading error: {e}")
-        return ""
+def ensure_job_index():
+    """Load the jobs from the database only the first time (or map the latest
+    snapshot), the index stays warm afterwards"""
+    return matcher.ensure_index(Job.query.all)
 
-def match_jobs(cv_text, keyword, location, user):
+def match_jobs(cv_text, keyword, location, user, top_k=None, min_score=None, processed_cv=None,
+               cv_skills=None, cv_key=None, cv_filename=None):
     """Match jobs using enhanced algorithm"""
-    # Get all jobs from database
-    jobs = Job.query.all()
-    
-    # Use enhanced matching algorithm
-    matched_results = matcher.match_jobs(cv_text, jobs, keyword, location)
-    
-    results = []
-    for match in matched_results:
-        job = match["job"]
-        results.append({
-            "id": job.id,
-            "title": job.title,
-            "location": job.location,
-            "company": job.company,
-            "match_score": match["match_score"],
-            "skills_matched": match["skills_matched"],
-            "skills_missing": match["skills_missing"]
-        })
-        
-        # Save match to database
-        job_match = JobMatch(
-            user_id=user.id,
-            job_id=job.id,
-            match_score=match["match_score"],
-            cv_filename=request.files.get("cv").filename if request.files.get("cv") else "Unknown",
-            skills_matched=",".join(match["skills_matched"]),
-            skills_missing=",".join(match["skills_missing"])
-        )
-        db.session.add(job_match)
+    if top_k is None:
+        top_k = app.config['MATCH_TOP_K']
+    if min_score is None:
+        min_score = app.config['MATCH_MIN_SCORE']
     
-    db.session.commit()
+    ensure_job_index()
+    
+    # Use enhanced matching algorithm on the indexed catalog
+    matched_results = matcher.match_jobs(cv_text, None, keyword, location,
+                                         top_k=top_k, min_score=min_score, processed_cv=processed_cv,
+                                         cv_skills=cv_skills, cv_key=cv_key)
+    results = [match_summary(match) for match in matched_results]
+    
+    save_matches(user.id, cv_filename or "Unknown", results)
     return results
 
+def save_matches(user_id, cv_filename, results):
+    """Save matches to the user's history"""
+    history_writer.save(user_id, cv_filename, results)
+
+match_queue.init_app(app, matcher, on_results=save_matches)
+
 def generate_skills_gap_chart(cv_text, matched_jobs):
-    cv_words = cv_text.lower().split()
-    all_skills = []
-    
-    for job in matched_jobs:
-        all_skills.extend(job["skills_matched"])
-        all_skills.extend(job["skills_missing"])
-    
-    skill_counts = {}
-    for skill in set(all_skills):
-        skill_counts[skill] = (skill.lower() in cv_words)
-    
-    labels = list(skill_counts.keys())
-    values = [1 if present else 0 for present in skill_counts.values()]
-    
-    plt.figure(figsize=(10, 4))
-    bars = plt.bar(labels, values, color=["green" if v else "red" for v in values])
-    plt.xticks(rotation=45)
-    plt.ylim(0, 1.2)
-    plt.title("Skills Gap Analysis (Green = Present, Red = Missing)")
-    
-    for bar in bars:
-        yval = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width()/2, yval + 0.05, f"{'✓' if yval else '✗'}", ha='center', fontsize=12)
-    
-    buf = BytesIO()
-    plt.tight_layout()
-    plt.savefig(buf, format="png")
-    buf.seek(0)
-    encoded = base64.b64encode(buf.getvalue()).decode("utf-8")
-    plt.close()
-    return f"data:image/png;base64,{encoded}"
-
-SKILLS_DB = [
-    "python", "sql", "excel", "power bi", "html", "css", "javascript",
-    "react", "flask", "django", "machine learning", "data analysis",
-    "statistics", "communication", "problem solving"
-]
+    """URL of the skills-gap chart, rendered when the browser asks for it"""
+    return url_for("skills_gap_chart", **skills_gap_params(cv_text, matched_jobs))
 
 def extract_skills_from_cv(text):
-    found = []
-    text = text.lower()
-
-    for skill in SKILLS_DB:
-        if skill in text:
-            found.append(skill.title())
+    found = default_taxonomy().extract(text or "")
+    return [skill.title() for skill in found]
 
-    return list(set(found))
 def calculate_skill_gap(required_skills, user_skills):
-    missing = [s for s in required_skills if s.lower() not in [u.lower() for u in user_skills]]
+    # Both sides are compared as canonical skills; having a skill covers its parent skills
+    taxonomy = default_taxonomy()
+    user_skill_ids = taxonomy.expand(user_skills)
+    missing = [s for s in required_skills if taxonomy.canonical(s) not in user_skill_ids]
+    if not required_skills:
+        # A job asking for no skills has no gap
+        return missing, 100
     score = (len(required_skills) - len(missing)) / len(required_skills) * 100
     return missing, round(score)
 
 
 def create_skill_chart(score):
-    plt.figure(figsize=(5,4))
-    plt.bar(["Skill Match"], [score])
-    plt.ylim(0, 100)
-
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-    base64_img = base64.b64encode(img.getvalue()).decode()
-
-    plt.close()
-    return base64_img
+    """URL of the skill match chart for a percentage"""
+    return url_for("skill_score_chart", score=score)
 
 def generate_email_report(user_email, matched_jobs):
     if not matched_jobs:
@@ -449,6 +524,19 @@ def send_email(to_email, subject, body):
    
     print(f"Sending email to {to_email}...\nSubject: {subject}\n\n{body}")
     
+@app.route("/charts/skills-gap.png")
+def skills_gap_chart():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    return chart_cache.skills_gap_response(request.args.get("skills"), request.args.get("present"),
+                                           ensure_job_index().skill_ids)
+
+@app.route("/charts/skill-score.png")
+def skill_score_chart():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    return chart_cache.skill_score_response(request.args.get("score", type=float))
+
 @app.route("/skills-gap", methods=["GET", "POST"])
 def skills_gap():
     jobs = load_jobs()
@@ -458,12 +546,12 @@ def skills_gap():
         cv_text = request.form.get("cv_text")
 
         # find selected job
-        job = next((j for j in jobs if j["title"] == selected_title), None)
+        job = next((j for j in jobs if j.title == selected_title), None)
 
         if not job:
             return "Job not found"
 
-        required_skills = job["required_skills"].split(",")
+        required_skills = list(parse_skills(job.required_skills))
 
         user_skills = extract_skills_from_cv(cv_text)
         missing_skills, score = calculate_skill_gap(required_skills, user_skills)
@@ -488,6 +576,11 @@ def skills_gap():
 def not_found_error(error):
     return render_template('404.html'), 404
 
+@app.errorhandler(413)
+def too_large_error(error):
+    flash(f"CV files are limited to {app.config['CV_MAX_BYTES'] // (1024 * 1024)}MB.", "warning")
+    return redirect(url_for("index"))
+
 @app.errorhandler(500)
 def internal_error(error):
     db.session.rollback()
@@ -498,19 +591,22 @@ def internal_error(error):
 
 @app.route("/dashboard")
 def dashboard():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
     
-    user_email = "student@example.com"
+    user = User.query.get(session["user_id"])
+    if user is None:
+        session.clear()
+        return redirect(url_for("login"))
 
-    stats = {
-        "jobs_matched": 3,
-        "last_login": "2026-01-14"
-    }
+    stats = user_stats(user.id)
+    stats["last_login"] = user.last_login.strftime("%Y-%m-%d") if user.last_login else None
 
     is_admin = True  
 
     return render_template(
         "dashboard.html",
-        user_email=user_email,
+        user_email=user.email,
         stats=stats,
         is_admin=is_admin
     )
@@ -522,21 +618,15 @@ def admin_panel():
     if not is_admin:
         return "Access denied", 403
 
-    jobs = load_jobs()
-
     if request.method == "POST":
         title = request.form.get("title")
         skills = request.form.get("skills")
 
-        jobs.append({
-            "title": title,
-            "required_skills": skills
-        })
+        # The commit updates the job index, no file to rewrite
+        db.session.add(Job(title=title, required_skills=",".join(parse_skills(skills))))
+        db.session.commit()
 
-        # Save back to JSON
-        with open("jobs.json", "w") as f:
-            
-            json.dump(jobs, f, indent=2)
+    jobs = load_jobs()
 
     return render_template("admin.html", jobs=jobs)
 
@@ -550,7 +640,7 @@ def test_matcher():
     """Test the enhanced matcher with actual database jobs"""
     test_cv = """
     Esther Moagi
-    IT Student with experience in Python, Microsoft Office, Excel, and communication skills.
+    IT Student with experience in Python, Microsoft Office, Microsoft Excel, and communication skills.
     Worked as Computer Literacy Assistant helping students with computer systems.
     Proficient in troubleshooting, teamwork, and networking.
     """
@@ -0,0 +1,210 @@
+# batch_matching.py
+"""Match a whole intake of CVs against the job catalog and stream the results to a file.
+
+Run from the job_matcher_app directory:
+
+    python batch_matching.py intake.jsonl results.csv --top-k 10 --workers 4
+
+The intake is a CSV or JSON-lines file with "id" and "text" columns, or a
+directory of CV files (.pdf, .docx, .txt) named after their ids. Results go
+to CSV, or to Parquet when the output ends in .parquet (needs pyarrow).
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from matching_algorithm import EnhancedMatcher, match_summary
+
+# Default number of CVs scored per block, each block holds block x jobs scores
+BLOCK_SIZE = 64
+
+# Columns of the output, one row per (CV, matched job)
+OUTPUT_COLUMNS = ["cv_id", "rank", "job_id", "title", "company", "location",
+                  "match_score", "skills_matched", "skills_missing"]
+
+# Parquet types of the output columns, declared so that a chunk where a column
+# is all None (e.g. company, unset for jobs added through /admin) still types it
+PARQUET_TYPES = {"cv_id": "string", "rank": "int32", "job_id": "int64", "title": "string",
+                 "company": "string", "location": "string", "match_score": "float64",
+                 "skills_matched": "string", "skills_missing": "string"}
+
+# Matcher of a worker process, set up by _init_worker
+_worker_matcher = None
+
+
+def _init_worker(job_index):
+    global _worker_matcher
+    _worker_matcher = EnhancedMatcher()
+    _worker_matcher.job_index = job_index
+
+
+def _match_block(block, top_k, min_score):
+    """Match one block of (cv_id, text) pairs inside a worker process"""
+    return _match_with(_worker_matcher, block, top_k, min_score)
+
+
+def _match_with(matcher, block, top_k, min_score):
+    results = matcher.match_many([text for _, text in block], top_k=top_k, min_score=min_score,
+                                 block_size=len(block))
+    return [(cv_id, [match_summary(match) for match in matches])
+            for (cv_id, _), matches in zip(block, results)]
+
+
+def match_many(job_index, cvs, top_k=10, min_score=None, workers=None, block_size=BLOCK_SIZE):
+    """Match (cv_id, text) pairs against an index on a pool of processes.
+
+    Yields (cv_id, match summaries) in input order. Only a few blocks per
+    worker are in flight at any time, so memory does not grow with the
+    number of CVs. With `workers=0` everything runs in this process.
+    """
+    blocks = _blocks(cvs, block_size)
+
+    if workers == 0:
+        matcher = EnhancedMatcher()
+        matcher.job_index = job_index
+        for block in blocks:
+            yield from _match_with(matcher, block, top_k, min_score)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(job_index,)) as pool:
+        in_flight = deque()
+        for block in blocks:
+            in_flight.append(pool.submit(_match_block, block, top_k, min_score))
+            if len(in_flight) >= 2 * workers:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def _blocks(cvs, block_size):
+    cvs = iter(cvs)
+    while True:
+        block = list(islice(cvs, block_size))
+        if not block:
+            return
+        yield block
+
+
+def read_intake(path, max_pages=None):
+    """Yield (cv_id, text) pairs from an intake file or directory"""
+    if os.path.isdir(path):
+        from cv_extraction import MAX_CV_PAGES, extract_text
+        for name in sorted(os.listdir(path)):
+            with open(os.path.join(path, name), "rb") as f:
+                yield os.path.splitext(name)[0], extract_text(f.read(), name, max_pages or MAX_CV_PAGES)
+
+    elif path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield row["id"], row["text"]
+
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    yield row["id"], row["text"]
+
+
+def _output_rows(cv_id, matches):
+    for rank, match in enumerate(matches, 1):
+        yield {
+            "cv_id": str(cv_id),
+            "rank": rank,
+            "job_id": match["id"],
+            "title": match["title"],
+            "company": match["company"],
+            "location": match["location"],
+            "match_score": match["match_score"],
+            "skills_matched": ",".join(match["skills_matched"]),
+            "skills_missing": ",".join(match["skills_missing"])
+        }
+
+
+class ResultWriter:
+    """Writes result rows to CSV or Parquet, a chunk at a time"""
+
+    def __init__(self, path, chunk_rows=50000):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self._rows = []
+        self._parquet = path.endswith(".parquet")
+        self._writer = None
+        self._file = None
+
+    def __enter__(self):
+        if not self._parquet:
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+            self._writer = csv.DictWriter(self._file, fieldnames=OUTPUT_COLUMNS)
+            self._writer.writeheader()
+        return self
+
+    def write(self, cv_id, matches):
+        if not self._parquet:
+            self._writer.writerows(_output_rows(cv_id, matches))
+            return
+
+        self._rows.extend(_output_rows(cv_id, matches))
+        if len(self._rows) >= self.chunk_rows:
+            self._flush_parquet()
+
+    def _flush_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            schema = pa.schema([(column, pa.type_for_alias(PARQUET_TYPES[column])) for column in OUTPUT_COLUMNS])
+            self._writer = pq.ParquetWriter(self.path, schema)
+
+        if self._rows:
+            self._writer.write_table(pa.Table.from_pylist(self._rows, schema=self._writer.schema))
+            self._rows = []
+
+    def __exit__(self, *exc_info):
+        if self._parquet:
+            self._flush_parquet()
+            if self._writer is not None:
+                self._writer.close()
+        else:
+            self._file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("intake")
+    parser.add_argument("output")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--min-score", type=float, default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="0 runs in this process")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+    args = parser.parse_args()
+
+    from app import app, ensure_job_index
+
+    with app.app_context():
+        job_index = ensure_job_index()
+    print(f"Matching against {len(job_index)} jobs with {args.workers} worker(s)...")
+
+    start = time.perf_counter()
+    n_cvs = 0
+    with ResultWriter(args.output) as writer:
+        for cv_id, matches in match_many(job_index, read_intake(args.intake), args.top_k, args.min_score,
+                                         args.workers, args.block_size):
+            writer.write(cv_id, matches)
+            n_cvs += 1
+            if n_cvs % 1000 == 0:
+                print(f"{n_cvs} CVs matched...")
+
+    elapsed = time.perf_counter() - start
+    print(f"{n_cvs} CVs matched in {elapsed:.1f}s ({n_cvs / max(elapsed, 1e-9):.0f} CVs/s)")
+
+
+if __name__ == "__main__":
+    main()
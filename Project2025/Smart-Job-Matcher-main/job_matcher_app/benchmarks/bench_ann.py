@@ -0,0 +1,69 @@
+# benchmarks/bench_ann.py
+"""Recall@K and latency of the ANN retrieval stage against exact scoring.
+
+Run from the job_matcher_app directory:
+
+    python -m benchmarks.bench_ann --jobs 200000 --queries 50 --top-k 10 --nprobe 4 8 16 32
+"""
+import argparse
+import time
+
+import numpy as np
+
+from matching_algorithm import EnhancedMatcher
+from benchmarks.synthetic import generate_cvs, generate_jobs
+
+
+def _timed_match(matcher, cv, top_k):
+    start = time.perf_counter()
+    results = matcher.match_jobs(cv, None, top_k=top_k)
+    return (time.perf_counter() - start) * 1000, [result["job"].id for result in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=None, help="default: sqrt(jobs)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    print(f"Generating {args.jobs} jobs and {args.queries} CVs...")
+    jobs = generate_jobs(args.jobs)
+    cvs = generate_cvs(args.queries)
+
+    # No ANN inside build_index, it is built (and timed) on its own below
+    matcher = EnhancedMatcher(ann_min_jobs=0, ann_nprobe=None)
+
+    start = time.perf_counter()
+    job_index = matcher.build_index(jobs)
+    print(f"Index built in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    job_index.build_ann(args.clusters)
+    print(f"ANN index ({len(job_index.ann.centroids)} clusters) built in {time.perf_counter() - start:.1f}s")
+
+    # Exact top-K is the reference
+    matcher.ann_nprobe = None
+    exact = [_timed_match(matcher, cv, args.top_k) for cv in cvs]
+    exact_ms = [ms for ms, _ in exact]
+    print(f"\nexact      p50 {np.percentile(exact_ms, 50):8.1f} ms   p99 {np.percentile(exact_ms, 99):8.1f} ms")
+
+    print(f"\n{'nprobe':>6}  {'recall@' + str(args.top_k):>10}  {'p50 ms':>8}  {'p99 ms':>8}")
+    for nprobe in args.nprobe:
+        matcher.ann_nprobe = nprobe
+        recalls, latencies = [], []
+
+        for cv, (_, exact_ids) in zip(cvs, exact):
+            ms, ids = _timed_match(matcher, cv, args.top_k)
+            latencies.append(ms)
+            if exact_ids:
+                recalls.append(len(set(ids) & set(exact_ids)) / len(exact_ids))
+
+        print(f"{nprobe:>6}  {np.mean(recalls):>10.3f}  "
+              f"{np.percentile(latencies, 50):>8.1f}  {np.percentile(latencies, 99):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
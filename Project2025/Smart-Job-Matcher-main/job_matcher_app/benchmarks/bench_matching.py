@@ -0,0 +1,222 @@
+# benchmarks/bench_matching.py
+"""Latency, throughput and memory of the matching path, compared against a saved baseline.
+
+Run from the job_matcher_app directory:
+
+    python -m benchmarks.bench_matching --save-baseline    # record the reference numbers
+    python -m benchmarks.bench_matching --sizes 10 100 1000 10000 100000 --cvs 50
+
+Covers preprocess_text, extract_skills, CV extraction (PDF, DOCX, TXT),
+match_jobs at each catalog size, and the full "/" upload through the Flask
+test client against a throwaway SQLite database. Exits with status 1 when
+a case's p50 is more than --tolerance slower than in the baseline.
+
+No baseline is shipped, timings only compare on the same machine: record
+one with --save-baseline before changing the code. The peak memory of a
+case is what one call allocates at most, traced with tracemalloc.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic import cv_document, generate_cvs, generate_jobs
+
+# Baseline written by --save-baseline, one entry per case
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Default slowdown of a case's p50 over the baseline reported as a regression
+TOLERANCE = 0.25
+
+CV_FORMATS = ("pdf", "docx", "txt")
+
+
+def peak_mb(function, value):
+    """Most memory allocated at once while `function(value)` runs, in MB"""
+    tracemalloc.start()
+    try:
+        function(value)
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def measure(function, inputs):
+    """Time `function` on each input but the first, which warms up caches and
+    lazy imports, and the last, whose call is traced for its peak memory
+    (tracing slows it down); the app's prints are silenced"""
+    warm_up, traced, inputs = inputs[0], inputs[-1], inputs[1:-1] or inputs
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        function(warm_up)
+        start = time.perf_counter()
+        for value in inputs:
+            call_start = time.perf_counter()
+            function(value)
+            latencies.append((time.perf_counter() - call_start) * 1000)
+        elapsed = time.perf_counter() - start
+        peak = peak_mb(function, traced)
+
+    return {
+        "calls": len(inputs),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "throughput": len(inputs) / elapsed if elapsed else float("inf"),
+        "peak_mb": peak
+    }
+
+
+def text_cases(cvs):
+    from matching_algorithm import EnhancedMatcher
+    matcher = EnhancedMatcher()
+    yield "preprocess_text", measure(matcher.preprocess_text, cvs)
+    yield "extract_skills", measure(matcher.extract_skills, cvs)
+
+
+def extraction_cases(cvs):
+    from cv_extraction import extract_text
+    for fmt in CV_FORMATS:
+        files = [(cv_document(cv, fmt), f"cv.{fmt}") for cv in cvs]
+        yield f"extract_cv[{fmt}]", measure(lambda file: extract_text(*file), files)
+
+
+def match_cases(size, cvs, top_k):
+    from matching_algorithm import EnhancedMatcher
+    matcher = EnhancedMatcher()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        matcher.build_index(generate_jobs(size))
+    print(f"  index of {size} jobs built in {time.perf_counter() - start:.2f}s")
+
+    yield f"match_jobs[{size}]", measure(lambda cv: matcher.match_jobs(cv, None, top_k=top_k), cvs)
+
+
+def configure_app(directory):
+    """Point the app at a throwaway database before it is imported"""
+    os.environ["DATABASE_URI"] = "sqlite:///" + os.path.join(directory, "bench.db")
+    os.environ["MATCH_SNAPSHOT_DIR"] = ""
+    os.environ["MATCH_CACHE_DIR"] = ""
+    os.environ["JOBS_JSON_PATH"] = ""
+
+
+def upload_cases(size, cvs, top_k):
+    from app import app, matcher
+    from ingest_jobs import refresh_index
+    from models import db, Job, User
+
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        db.create_all()
+        db.session.execute(Job.__table__.delete())
+        db.session.execute(Job.__table__.insert(), [job._asdict() for job in generate_jobs(size)])
+
+        user = User.query.filter_by(email="bench@example.com").first()
+        if user is None:
+            user = User(email="bench@example.com", name="Bench")
+            user.set_password("bench")
+            db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+        refresh_index(matcher)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+
+    # A different CV per catalog size, so no upload is answered from the match cache
+    files = [cv_document(f"{cv} {size}", "txt") for cv in cvs]
+
+    def upload(data):
+        response = client.post("/", data={"cv": (io.BytesIO(data), "cv.txt"), "top_k": str(top_k)},
+                               content_type="multipart/form-data")
+        if response.status_code != 200:
+            raise RuntimeError(f"POST / returned {response.status_code}")
+
+    yield f"post_index[{size}]", measure(upload, files)
+
+
+def compare(results, baseline, tolerance):
+    """Print the results next to the baseline, returns the regressed cases"""
+    print(f"\n{'case':<24} {'p50 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'peak MB':>8}  vs baseline p50")
+    regressions = []
+    for case, result in results.items():
+        line = (f"{case:<24} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+                f"{result['throughput']:>9.1f} {result['peak_mb']:>8.1f}")
+
+        reference = baseline.get(case)
+        if reference:
+            ratio = result["p50_ms"] / reference["p50_ms"] if reference["p50_ms"] else 1.0
+            line += f"  {ratio:5.2f}x"
+            if ratio > 1 + tolerance:
+                line += "  REGRESSION"
+                regressions.append(case)
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--cvs", type=int, default=50,
+                        help="CVs per case, the first one warms up and the last one is traced")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--skip", nargs="*", default=[], choices=["text", "extract", "match", "upload"])
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    cvs = generate_cvs(args.cvs)
+    results = {}
+
+    def run(cases):
+        for case, result in cases:
+            results[case] = result
+            print(f"  {case}: p50 {result['p50_ms']:.2f} ms")
+
+    if "text" not in args.skip:
+        print("Text processing...")
+        run(text_cases(cvs))
+    if "extract" not in args.skip:
+        print("CV extraction...")
+        run(extraction_cases(cvs))
+
+    # The app keeps its database open until exit, which Windows refuses to delete
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as directory:
+        configure_app(directory)
+        for size in args.sizes:
+            print(f"Catalog of {size} jobs...")
+            size_cvs = generate_cvs(args.cvs, seed=size)
+            if "match" not in args.skip:
+                run(match_cases(size, size_cvs, args.top_k))
+            if "upload" not in args.skip:
+                run(upload_cases(size, size_cvs, args.top_k))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    elif not args.save_baseline:
+        print(f"\nNo baseline at {args.baseline} to compare with, record one with --save-baseline")
+
+    regressions = compare(results, {} if args.save_baseline else baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(dict(baseline, **results), f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_skills.py
+"""Cost of skill normalization per document with the compiled skill taxonomy.
+
+Run from the job_matcher_app directory:
+
+    python -m benchmarks.bench_skills --jobs 20000 --cvs 2000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import generate_cvs, generate_jobs
+from skill_taxonomy import TAXONOMY_PATH, SkillTaxonomy
+
+
+def _aliased(text, taxonomy, rng):
+    # Spell some of the skills the way people do: "JS", "Postgres", "PowerBI"...
+    aliases = taxonomy.aliases
+    return ",".join(rng.choice(aliases.get(skill, [skill])) for skill in text.split(","))
+
+
+def _per_document(function, documents):
+    latencies = []
+    for document in documents:
+        start = time.perf_counter()
+        function(document)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+
+def _report(name, latencies):
+    print(f"{name:<28} mean {np.mean(latencies):8.1f} us   p50 {np.percentile(latencies, 50):8.1f} us   "
+          f"p99 {np.percentile(latencies, 99):8.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20000)
+    parser.add_argument("--cvs", type=int, default=2000)
+    parser.add_argument("--taxonomy", default=TAXONOMY_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    taxonomy = SkillTaxonomy.load(args.taxonomy)
+    print(f"Taxonomy of {len(taxonomy)} skills compiled in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    rng = random.Random(0)
+    skill_lists = [_aliased(job.required_skills, taxonomy, rng) for job in generate_jobs(args.jobs)]
+    cvs = generate_cvs(args.cvs)
+
+    # Job skill lists: one dict lookup per skill
+    _report("job skills (canonicalize)", _per_document(lambda skills: taxonomy.canonicalize(skills.split(",")),
+                                                        skill_lists))
+
+    # CV texts: one pass of the automaton, then the parent skills
+    _report("cv text (extract)", _per_document(taxonomy.extract, cvs))
+    _report("cv text (extract + expand)", _per_document(lambda cv: taxonomy.expand(taxonomy.extract(cv)), cvs))
+
+    raw = {skill.strip().lower() for skills in skill_lists for skill in skills.split(",")}
+    print(f"\n{len(raw)} distinct spellings in the job skill lists, "
+          f"{len(taxonomy.canonicalize(raw))} distinct canonical skills")
+
+
+if __name__ == "__main__":
+    main()
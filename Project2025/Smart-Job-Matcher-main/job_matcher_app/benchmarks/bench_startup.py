@@ -0,0 +1,74 @@
+# benchmarks/bench_startup.py
+"""Cold-start time of the web app against a startup budget.
+
+Run from the job_matcher_app directory:
+
+    python -m benchmarks.bench_startup --runs 5 --budget 1.5
+
+Each run imports `app` in a fresh interpreter, the way a new gunicorn worker
+does. Exits with status 1 when the median import time is over budget, and
+lists the slowest imports of the last run (python -X importtime).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Default cold-start budget in seconds, overridden by STARTUP_BUDGET or --budget
+STARTUP_BUDGET = 1.5
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _cold_start(module):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=_APP_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr}")
+    return elapsed, result.stderr
+
+
+def _slowest_imports(importtime_log, count):
+    """(cumulative seconds, module) of the slowest imports in an -X importtime log"""
+    imports = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            imports.append((int(cumulative) / 1e6, module.rstrip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=float(os.getenv("STARTUP_BUDGET", STARTUP_BUDGET)))
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.runs):
+        elapsed, log = _cold_start(args.module)
+        timings.append(elapsed)
+
+    median = statistics.median(timings)
+    print(f"import {args.module}: median {median:.2f}s  min {min(timings):.2f}s  max {max(timings):.2f}s  "
+          f"(budget {args.budget:.2f}s)")
+
+    print(f"\n{'cumulative s':>12}  module")
+    for seconds, module in _slowest_imports(log, args.top):
+        print(f"{seconds:>12.3f}  {module}")
+
+    if median > args.budget:
+        print(f"\nOver the startup budget by {median - args.budget:.2f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/synthetic.py
+import io
+import random
+import string
+
+from job_index import JobRecord
+
+# Each field has its own titles, skills and vocabulary so the catalog has topics
+FIELDS = {
+    "software": {
+        "titles": ["Software Engineer", "Python Developer", "Backend Developer", "Java Developer"],
+        "skills": ["python", "java", "git", "sql", "docker", "flask", "django", "linux", "aws"],
+    },
+    "web": {
+        "titles": ["Web Developer", "Frontend Developer", "Full Stack Developer", "UI Developer"],
+        "skills": ["html", "css", "javascript", "react", "angular", "vue", "node.js", "express.js"],
+    },
+    "data": {
+        "titles": ["Data Analyst", "Data Scientist", "BI Analyst", "Machine Learning Engineer"],
+        "skills": ["python", "sql", "microsoft excel", "powerbi", "statistics", "machine learning", "data analysis"],
+    },
+    "support": {
+        "titles": ["IT Support Technician", "Helpdesk Analyst", "Systems Administrator", "Network Technician"],
+        "skills": ["troubleshooting", "windows", "networking", "communication", "linux", "azure"],
+    },
+    "security": {
+        "titles": ["Cybersecurity Intern", "Security Analyst", "SOC Analyst", "Penetration Tester"],
+        "skills": ["cybersecurity", "networking", "linux", "python", "cloud computing", "devops"],
+    },
+}
+
+LOCATIONS = ["Cape Town", "Johannesburg", "Durban", "Pretoria", "Port Elizabeth", "Bloemfontein", "Remote"]
+
+COMPANIES = ["Tech Solutions Inc.", "Data Insights Ltd.", "WebCraft Studios",
+             "SecureNet Systems", "IT Helpdesk Solutions", "Cloudline", "Bright Labs"]
+
+# Size of the made-up vocabulary of each field
+WORDS_PER_FIELD = 2000
+
+
+def _word(rng):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+
+
+def _vocabulary(seed):
+    rng = random.Random(seed)
+    return {field: [_word(rng) for _ in range(WORDS_PER_FIELD)] for field in FIELDS}
+
+
+def generate_jobs(count, seed=0, skills_per_job=(3, 8), description_words=(20, 120)):
+    """Deterministic synthetic jobs as JobRecords with ids 1..count"""
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(seed)
+    fields = list(FIELDS)
+    jobs = []
+
+    for job_id in range(1, count + 1):
+        field = rng.choice(fields)
+        spec = FIELDS[field]
+
+        n_skills = min(rng.randint(*skills_per_job), len(spec["skills"]))
+        skills = rng.sample(spec["skills"], n_skills)
+        words = rng.choices(vocabulary[field], k=rng.randint(*description_words))
+
+        jobs.append(JobRecord(
+            id=job_id,
+            title=rng.choice(spec["titles"]),
+            company=rng.choice(COMPANIES),
+            location=rng.choice(LOCATIONS),
+            description=" ".join(words),
+            required_skills=",".join(skills),
+        ))
+
+    return jobs
+
+
+def generate_cvs(count, seed=1, words=(80, 400)):
+    """Deterministic synthetic CV texts, each leaning towards one field"""
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(0)
+    fields = list(FIELDS)
+    cvs = []
+
+    for _ in range(count):
+        field = rng.choice(fields)
+        skills = rng.sample(FIELDS[field]["skills"], rng.randint(2, len(FIELDS[field]["skills"])))
+        body = rng.choices(vocabulary[field], k=rng.randint(*words))
+        body += rng.choices(vocabulary[rng.choice(fields)], k=len(body) // 4)
+        cvs.append(f"Experienced in {', '.join(skills)}. " + " ".join(body))
+
+    return cvs
+
+
+# Words per PDF page and per DOCX paragraph of the generated CV documents
+WORDS_PER_PAGE = 350
+WORDS_PER_PARAGRAPH = 40
+
+
+def cv_document(text, fmt):
+    """Bytes of a CV document holding `text`; `fmt` is pdf, docx or txt"""
+    if fmt == "txt":
+        return text.encode("utf-8")
+
+    words = text.split()
+    if fmt == "pdf":
+        import fitz
+        doc = fitz.open()
+        for start in range(0, len(words), WORDS_PER_PAGE):
+            page = doc.new_page()
+            margin = fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50)
+            page.insert_textbox(margin, " ".join(words[start:start + WORDS_PER_PAGE]), fontsize=9)
+        data = doc.tobytes()
+        doc.close()
+        return data
+
+    if fmt == "docx":
+        from docx import Document
+        document = Document()
+        for start in range(0, len(words), WORDS_PER_PARAGRAPH):
+            document.add_paragraph(" ".join(words[start:start + WORDS_PER_PARAGRAPH]))
+        buf = io.BytesIO()
+        document.save(buf)
+        return buf.getvalue()
+
+    raise ValueError(f"Unknown CV format: {fmt}")
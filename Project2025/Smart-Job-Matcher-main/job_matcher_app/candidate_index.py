@@ -0,0 +1,163 @@
+# candidate_index.py
+import heapq
+import threading
+import time
+
+from models import db, UserSkill
+
+# Proficiency of skills saved without one, on the 1-5 scale of UserSkill
+DEFAULT_PROFICIENCY = 1
+
+# Default number of seconds before the index is reloaded from user_skills,
+# which picks up skills written by other worker processes
+CANDIDATE_INDEX_TTL = 300
+
+
+def skill_weight(proficiency):
+    """Weight of a user's skill in candidate scores, 0.2 to 1"""
+    proficiency = min(max(proficiency or DEFAULT_PROFICIENCY, 1), 5)
+    return proficiency / 5
+
+
+class CandidateIndex:
+    """Inverted index from skill to the users who have it.
+
+    Skills are the integer ids of the skills table (see user_skills). Each
+    posting maps a user id to the weight of their proficiency in the
+    skill. Ranking the candidates of a job only walks the postings of the
+    job's skills, so users sharing none of them are never looked at. The
+    index is loaded from user_skills in one scan and kept current with
+    set_user_skills, then reloaded every `ttl` seconds (None never) to pick
+    up other processes' edits. Given the Flask `app`, that reload runs in a
+    background thread and requests keep using the loaded index meanwhile.
+    """
+
+    def __init__(self, ttl=CANDIDATE_INDEX_TTL, app=None):
+        self.ttl = ttl
+        self.app = app
+        self._postings = {}  # skill_id -> {user_id: weight}
+        self._user_skills = {}  # user_id -> {skill_id: weight}
+        self._loaded_at = None
+        self._lock = threading.RLock()
+
+        # Users changed while a reload scans the table, reapplied after it
+        self._changed_during_load = None
+        self._refresh_thread = None
+
+    def __len__(self):
+        return len(self._user_skills)
+
+    def ensure_loaded(self):
+        """Load the index on first use and once it is older than the ttl"""
+        loaded_at = self._loaded_at
+        if loaded_at is None:
+            self.load()
+        elif self.ttl is not None and time.monotonic() - loaded_at > self.ttl:
+            if self.app is None:
+                self.load()
+            else:
+                self._refresh_later()
+
+    def _refresh_later(self):
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._refresh, daemon=True)
+            self._refresh_thread.start()
+
+    def _refresh(self):
+        try:
+            with self.app.app_context():
+                self.load()
+        except Exception as e:
+            print(f"Could not reload the candidate index: {e}")
+            with self._lock:
+                # Keep serving the loaded index, try again after another ttl
+                self._changed_during_load = None
+                self._loaded_at = time.monotonic()
+
+    def load(self):
+        """Rebuild the whole index from the user_skills table"""
+        with self._lock:
+            self._changed_during_load = {}
+
+        postings, user_skills = {}, {}
+        rows = db.session.execute(
+            db.select(UserSkill.user_id, UserSkill.skill_id, UserSkill.proficiency)
+            .where(UserSkill.skill_id.isnot(None))
+        ).yield_per(5000)
+        for user_id, skill_id, proficiency in rows:
+            weight = skill_weight(proficiency)
+            user_skills.setdefault(user_id, {})[skill_id] = weight
+            postings.setdefault(skill_id, {})[user_id] = weight
+
+        with self._lock:
+            changed, self._changed_during_load = self._changed_during_load or {}, None
+            self._postings, self._user_skills = postings, user_skills
+            self._loaded_at = time.monotonic()
+            # The scan may have read these users before their edits were committed
+            for user_id, weights in changed.items():
+                self._set(user_id, weights)
+
+    def set_user_skills(self, user_id, skills):
+        """Replace a user's postings; `skills` maps skill ids to proficiency"""
+        weights = {skill_id: skill_weight(proficiency) for skill_id, proficiency in skills.items()}
+
+        with self._lock:
+            if self._changed_during_load is not None:
+                self._changed_during_load[user_id] = weights
+            if self._loaded_at is not None:
+                # Before the first load there is nothing to update, it reads the table
+                self._set(user_id, weights)
+
+    def _set(self, user_id, weights):
+        with self._lock:
+            for skill in self._user_skills.pop(user_id, {}):
+                posting = self._postings.get(skill)
+                if posting is not None:
+                    posting.pop(user_id, None)
+                    if not posting:
+                        del self._postings[skill]
+
+            if weights:
+                self._user_skills[user_id] = weights
+                for skill, weight in weights.items():
+                    self._postings.setdefault(skill, {})[user_id] = weight
+
+    def top_candidates(self, job_skills, top_k=10, min_score=0, n_required=None):
+        """Best `top_k` users for a job requiring the skill ids `job_skills`, best first.
+
+        The score is the proficiency-weighted share of the job's skills a user
+        has, in percent. Returns dicts with "user_id", "score",
+        "skills_matched" and "skills_missing" (skill ids). `n_required`
+        counts skills of the job that have no id, which nobody can match.
+        """
+        job_skills = tuple(dict.fromkeys(job_skills))
+        n_required = max(n_required or 0, len(job_skills))
+        if not job_skills:
+            return []
+
+        totals, matched = {}, {}
+        with self._lock:
+            for skill in job_skills:
+                for user_id, weight in self._postings.get(skill, {}).items():
+                    totals[user_id] = totals.get(user_id, 0) + weight
+                    matched.setdefault(user_id, []).append(skill)
+
+        # Ties go to the user with more of the skills, then the older account
+        best = heapq.nlargest(top_k, totals.items(),
+                              key=lambda item: (item[1], len(matched[item[0]]), -item[0]))
+
+        candidates = []
+        for user_id, total in best:
+            score = round(100 * total / n_required, 1)
+            if score < (min_score or 0):
+                break
+            has = set(matched[user_id])
+            candidates.append({
+                "user_id": user_id,
+                "score": score,
+                "skills_matched": matched[user_id],
+                "skills_missing": [skill for skill in job_skills if skill not in has]
+            })
+        return candidates
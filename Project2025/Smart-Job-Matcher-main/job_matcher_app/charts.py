@@ -0,0 +1,137 @@
+# charts.py
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from flask import Response, abort, request
+
+# Default number of rendered charts kept in memory
+CHART_CACHE_SIZE = 512
+
+# Most skills a skills-gap chart can show
+MAX_CHART_SKILLS = 60
+
+# Charts only depend on their URL, browsers may keep them for a day
+CHART_MAX_AGE = 24 * 60 * 60
+
+
+def skills_gap_params(cv_text, matched_jobs):
+    """URL parameters of the skills-gap chart: the skills of the matched jobs
+    and, for each one, whether the CV mentions it ("1") or not ("0")"""
+    cv_words = set((cv_text or "").lower().split())
+    skills = sorted({skill for job in matched_jobs
+                     for skill in list(job["skills_matched"]) + list(job["skills_missing"])})[:MAX_CHART_SKILLS]
+    return {
+        "skills": ",".join(skills),
+        "present": "".join("1" if skill.lower() in cv_words else "0" for skill in skills)
+    }
+
+
+def _new_figure(figsize):
+    # A Figure with its own Agg canvas, no pyplot global state involved;
+    # matplotlib is imported with the first chart, not at startup
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def _png(figure):
+    buf = BytesIO()
+    figure.tight_layout()
+    figure.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+def render_skills_gap(skills, present):
+    """Bar chart of which skills the CV has (green) or misses (red)"""
+    figure = _new_figure((10, 4))
+    ax = figure.subplots()
+
+    values = [1 if has_skill else 0 for has_skill in present]
+    bars = ax.bar(skills, values, color=["green" if v else "red" for v in values])
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.set_ylim(0, 1.2)
+    ax.set_title("Skills Gap Analysis (Green = Present, Red = Missing)")
+
+    for bar in bars:
+        yval = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2, yval + 0.05, f"{'✓' if yval else '✗'}", ha='center', fontsize=12)
+
+    return _png(figure)
+
+
+def render_skill_score(score):
+    """Single bar with the skill match percentage"""
+    figure = _new_figure((5, 4))
+    ax = figure.subplots()
+    ax.bar(["Skill Match"], [score])
+    ax.set_ylim(0, 100)
+    return _png(figure)
+
+
+class ChartCache:
+    """Rendered PNG charts, keyed by what they show.
+
+    Charts are rendered when their image URL is requested rather than while
+    the page itself is built, and the same skills vector is only ever
+    rendered once per process. The cache key doubles as the ETag.
+    """
+
+    def __init__(self, max_charts=CHART_CACHE_SIZE):
+        self.max_charts = max_charts
+        self._charts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kind, *params):
+        return hashlib.sha1(repr((kind,) + params).encode("utf-8")).hexdigest()
+
+    def get(self, kind, params, render):
+        """(etag, png) of a chart, rendering it with `render(*params)` on a miss"""
+        key = self.key(kind, *params)
+        with self._lock:
+            png = self._charts.get(key)
+            if png is not None:
+                self._charts.move_to_end(key)
+                return key, png
+
+        png = render(*params)
+
+        with self._lock:
+            self._charts[key] = png
+            while len(self._charts) > self.max_charts:
+                self._charts.popitem(last=False)
+        return key, png
+
+    def response(self, kind, params, render):
+        """PNG response with an ETag, answering revalidations with 304"""
+        etag, png = self.get(kind, params, render)
+        response = Response(png, mimetype="image/png")
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = CHART_MAX_AGE
+        return response.make_conditional(request)
+
+    def skills_gap_response(self, skills, present, known_skills):
+        """Response for the parameters built by skills_gap_params.
+
+        Only sorted, distinct skills of `known_skills` (the skills of the job
+        catalog) are charted, so each chart has one URL and request
+        arguments cannot make up new charts without bound.
+        """
+        skills = tuple(skill for skill in (skills or "").split(",") if skill)
+        present = present or ""
+        if len(skills) > MAX_CHART_SKILLS or len(present) != len(skills) or set(present) - {"0", "1"}:
+            abort(400)
+        if list(skills) != sorted(set(skills)) or not all(skill in known_skills for skill in skills):
+            abort(400)
+        return self.response("skills_gap", (skills, tuple(flag == "1" for flag in present)), render_skills_gap)
+
+    def skill_score_response(self, score):
+        if score is None or not 0 <= score <= 100:
+            abort(400)
+        return self.response("skill_score", (round(score),), render_skill_score)
@@ -0,0 +1,217 @@
+# cv_extraction.py
+import io
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+# Default limits, overridden by CV_MAX_BYTES / CV_MAX_PAGES / CV_EXTRACT_TIMEOUT
+MAX_CV_BYTES = 5 * 1024 * 1024
+MAX_CV_PAGES = 20
+EXTRACT_TIMEOUT = 15  # seconds
+
+# DOCX files have no pages, their paragraphs are yielded in blocks of this size
+DOCX_PARAGRAPHS_PER_PAGE = 40
+
+
+class CVTooLarge(Exception):
+    """Raised when an uploaded CV is over the byte limit"""
+
+
+class ExtractionTimeout(Exception):
+    """Raised when extracting a CV takes longer than allowed"""
+
+
+@contextmanager
+def deadline(seconds):
+    """Raise ExtractionTimeout in the main thread once `seconds` have passed.
+
+    Only available where SIGALRM exists; elsewhere the block runs unbounded
+    and the caller's own timeout applies.
+    """
+    if (not seconds or not hasattr(signal, 'SIGALRM')
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+
+    def expire(signum, frame):
+        raise ExtractionTimeout(f"CV extraction took longer than {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def iter_pages(data, filename, max_pages=MAX_CV_PAGES):
+    """Yield the text of a CV one page at a time, up to `max_pages` pages"""
+    filename = (filename or "").lower()
+
+    # Parsers are imported on first use, in the extraction worker
+    if filename.endswith(".pdf"):
+        import fitz  # PyMuPDF for PDFs
+        doc = fitz.open(stream=data, filetype="pdf")
+        try:
+            for number, page in enumerate(doc):
+                if number >= max_pages:
+                    print(f"PDF has {doc.page_count} pages, only the first {max_pages} are read")
+                    break
+                yield page.get_text()
+        finally:
+            doc.close()
+
+    elif filename.endswith(".docx"):
+        from docx import Document  # python-docx for DOCX
+        paragraphs = [para.text for para in Document(io.BytesIO(data)).paragraphs]
+        for number, start in enumerate(range(0, len(paragraphs), DOCX_PARAGRAPHS_PER_PAGE)):
+            if number >= max_pages:
+                print(f"DOCX is longer than {max_pages} pages, the rest is skipped")
+                break
+            yield " ".join(paragraphs[start:start + DOCX_PARAGRAPHS_PER_PAGE])
+
+    elif filename.endswith(".txt"):
+        yield data.decode("utf-8", errors="ignore")
+
+    else:
+        print(f"Unsupported file type: {filename}")
+
+
+def extract_text(data, filename, max_pages=MAX_CV_PAGES):
+    """Extracts text from the raw bytes of a CV based on file type."""
+    text, _ = extract_and_preprocess(data, filename, None, max_pages)
+    return text
+
+
+def extract_and_preprocess(data, filename, preprocess, max_pages=MAX_CV_PAGES):
+    """Extract a CV page by page, preprocessing each page after it is parsed.
+
+    Both stages run in turn in the calling thread, they do not overlap; the
+    CV's text is just never preprocessed as one big string. Returns the raw
+    text and the preprocessed text (None without `preprocess`).
+    """
+    pages = []
+    processed = []
+
+    try:
+        for page in iter_pages(data, filename, max_pages):
+            pages.append(page)
+            if preprocess is not None:
+                processed.append(preprocess(page))
+    except ExtractionTimeout:
+        raise
+    except Exception as e:
+        print(f"CV read error ({filename}): {e}")
+        return "", ("" if preprocess is not None else None)
+
+    text = " ".join(pages)
+    print(f"Extracted {len(text)} characters from {len(pages)} page(s) of {filename}")
+
+    if preprocess is None:
+        return text, None
+    return text, " ".join(page for page in processed if page)
+
+
+# Preprocessing function of an extraction worker process, set up by _init_worker
+_worker_preprocess = None
+
+
+def _init_worker(pids=None):
+    global _worker_preprocess
+    if pids is not None:
+        # Lets CVExtractor stop this process should it get stuck
+        pids.put(os.getpid())
+    from matching_algorithm import EnhancedMatcher
+    _worker_preprocess = EnhancedMatcher().preprocess_text
+
+
+def _extract_in_worker(data, filename, max_pages, timeout):
+    with deadline(timeout):
+        return extract_and_preprocess(data, filename, _worker_preprocess, max_pages)
+
+
+class CVExtractor:
+    """Extracts CV text on a dedicated process pool.
+
+    Parsing a malformed or huge document can hang or use a lot of memory, so
+    it happens outside the web worker, with a byte limit, a page limit and a
+    per-file timeout. A worker stuck past the timeout, e.g. in C code that
+    SIGALRM cannot interrupt, is terminated and the pool replaced. Workers also preprocess each page after parsing
+    it, so the matcher gets the preprocessed CV text back as well.
+    """
+
+    def __init__(self, app=None):
+        self._pool = None
+        self._pids = None  # Queue the workers of the pool put their pid in
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CV_MAX_BYTES', MAX_CV_BYTES)
+        app.config.setdefault('CV_MAX_PAGES', MAX_CV_PAGES)
+        app.config.setdefault('CV_EXTRACT_TIMEOUT', EXTRACT_TIMEOUT)
+        app.config.setdefault('CV_EXTRACT_WORKERS', 2)
+
+        self.max_bytes = app.config['CV_MAX_BYTES']
+        self.max_pages = app.config['CV_MAX_PAGES']
+        self.timeout = app.config['CV_EXTRACT_TIMEOUT']
+        self.workers = app.config['CV_EXTRACT_WORKERS']
+        app.extensions['cv_extractor'] = self
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pids = multiprocessing.SimpleQueue()
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self._pids,))
+            return self._pool
+
+    def _recycle(self, pool):
+        """Drop a pool whose worker is stuck or died, the next extraction starts a new one"""
+        with self._lock:
+            if self._pool is not pool:
+                # Another request recycled it already
+                return
+            self._pool, pids = None, self._pids
+
+        # ProcessPoolExecutor cannot cancel a running task, stop its processes instead
+        while not pids.empty():
+            try:
+                os.kill(pids.get(), signal.SIGTERM)
+            except OSError:
+                pass  # Already exited
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def read_upload(self, file):
+        """Read an uploaded file, refusing anything over the byte limit"""
+        file.stream.seek(0)
+        data = file.stream.read(self.max_bytes + 1)
+        if len(data) > self.max_bytes:
+            raise CVTooLarge(f"CV files are limited to {self.max_bytes // (1024 * 1024)}MB")
+        return data
+
+    def extract(self, data, filename):
+        """Return (text, preprocessed text) of a CV; empty strings on failure"""
+        if len(data) > self.max_bytes:
+            raise CVTooLarge(f"CV files are limited to {self.max_bytes // (1024 * 1024)}MB")
+
+        pool = self._executor()
+        try:
+            future = pool.submit(_extract_in_worker, data, filename, self.max_pages, self.timeout)
+            # The worker enforces the timeout itself, this catches hard hangs in C code
+            return future.result(timeout=self.timeout + 5)
+        except ExtractionTimeout as e:
+            print(f"{filename}: {e}")
+        except FutureTimeout:
+            print(f"{filename}: extraction worker did not respond, restarting the pool")
+            self._recycle(pool)
+        except BrokenProcessPool:
+            print(f"{filename}: extraction worker crashed, restarting the pool")
+            self._recycle(pool)
+        return "", ""
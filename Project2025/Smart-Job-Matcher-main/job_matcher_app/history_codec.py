@@ -0,0 +1,60 @@
+# history_codec.py
+import numpy as np
+
+# Scores are stored as tenths of a percent, matching the rounding of match_jobs
+SCORE_SCALE = 10
+
+_JOB_ID_DTYPE = np.dtype('<u4')
+_SCORE_DTYPE = np.dtype('<u2')
+
+
+def encode_matches(matches):
+    """Pack the matches of one upload into compact columns.
+
+    `matches` are dicts with "id", "match_score", "skills_matched" and
+    "skills_missing" (see matching_algorithm.match_summary). Returns a dict
+    with the packed job ids, packed scores, the skills they reference
+    (comma-separated) and, per match, a matched and a missing bitset over
+    those skills.
+    """
+    skills = {}
+    for match in matches:
+        for skill in list(match["skills_matched"]) + list(match["skills_missing"]):
+            skills.setdefault(skill, len(skills))
+
+    bits = np.zeros((len(matches), 2, len(skills)), dtype=bool)
+    for position, match in enumerate(matches):
+        bits[position, 0, [skills[skill] for skill in match["skills_matched"]]] = True
+        bits[position, 1, [skills[skill] for skill in match["skills_missing"]]] = True
+
+    scores = np.rint(np.array([match["match_score"] for match in matches], dtype=np.float64) * SCORE_SCALE)
+    return {
+        "job_ids": np.array([match["id"] for match in matches], dtype=_JOB_ID_DTYPE).tobytes(),
+        "scores": np.clip(scores, 0, np.iinfo(_SCORE_DTYPE).max).astype(_SCORE_DTYPE).tobytes(),
+        "skills": ",".join(skills),
+        "skill_bits": np.packbits(bits, axis=-1).tobytes()
+    }
+
+
+def decode_job_ids(job_ids):
+    """Job ids of a packed run, best match first"""
+    return np.frombuffer(job_ids or b"", dtype=_JOB_ID_DTYPE).tolist()
+
+
+def decode_matches(job_ids, scores, skills, skill_bits):
+    """Unpack the columns written by encode_matches into a list of dicts
+    with "job_id", "match_score", "skills_matched" and "skills_missing"."""
+    ids = decode_job_ids(job_ids)
+    match_scores = (np.frombuffer(scores or b"", dtype=_SCORE_DTYPE) / SCORE_SCALE).tolist()
+    names = skills.split(",") if skills else []
+
+    width = (len(names) + 7) // 8
+    packed = np.frombuffer(skill_bits or b"", dtype=np.uint8).reshape(len(ids), 2, width)
+    bits = np.unpackbits(packed, axis=-1, count=len(names)).astype(bool)
+
+    return [{
+        "job_id": job_id,
+        "match_score": score,
+        "skills_matched": [names[i] for i in np.flatnonzero(bits[position, 0])],
+        "skills_missing": [names[i] for i in np.flatnonzero(bits[position, 1])]
+    } for position, (job_id, score) in enumerate(zip(ids, match_scores))]
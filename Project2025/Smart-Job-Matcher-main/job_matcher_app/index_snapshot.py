@@ -0,0 +1,345 @@
+# index_snapshot.py
+import copy
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from scipy import sparse
+
+from job_index import JobIndex, JobRecord
+from skill_taxonomy import taxonomy_version
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# File naming the snapshot currently in use, swapped atomically
+CURRENT_FILE = "CURRENT"
+
+# File locked by the process writing a snapshot
+LOCK_FILE = "LOCK"
+
+# Sparse matrices of the index stored as memory-mappable arrays
+_MATRICES = ("matrix", "skill_matrix")
+_PARTS = ("data", "indices", "indptr")
+
+# Dense arrays of the index; tombstoning and upserts write to the copied ones
+_ARRAYS = ("skill_counts", "_fitted_df")
+_COPIED_ARRAYS = ("alive", "_df")
+
+# Arrays of the ANN stage, which only ever reads them
+_ANN_ARRAYS = ("centroids", "_order", "_offsets")
+
+# JobRecord fields stored as text columns, the id is an int64 array
+_TEXT_FIELDS = JobRecord._fields[1:]
+
+# Derived from the records again when a snapshot is loaded (see JobIndex._index_records)
+_REBUILT = ("row_of", "job_skills", "title_postings", "location_postings")
+
+
+def _save_array(directory, name, array, digest):
+    array = np.ascontiguousarray(array)
+    digest.update(name.encode())
+    digest.update(array)
+    np.save(os.path.join(directory, f"{name}.npy"), array)
+
+
+def _map_array(directory, name):
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+
+
+def _save_matrix(directory, name, matrix, digest):
+    matrix = matrix.tocsr()
+    for part in _PARTS:
+        _save_array(directory, f"{name}.{part}", getattr(matrix, part), digest)
+
+
+def _map_matrix(directory, name, shape):
+    data, indices, indptr = (_map_array(directory, f"{name}.{part}") for part in _PARTS)
+    return sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+
+def _save_strings(directory, name, strings, digest):
+    """Store strings (or None) as one UTF-8 buffer, their offsets and a null mask"""
+    encoded = [b"" if string is None else string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    _save_array(directory, f"{name}.text", np.frombuffer(b"".join(encoded), dtype=np.uint8), digest)
+    _save_array(directory, f"{name}.offsets", offsets, digest)
+    _save_array(directory, f"{name}.nulls", np.array([string is None for string in strings], dtype=bool), digest)
+
+
+class _MappedStrings:
+    """Strings saved by _save_strings, decoded one at a time from the mapped buffer"""
+
+    def __init__(self, directory, name):
+        self.text = _map_array(directory, f"{name}.text")
+        self.offsets = _map_array(directory, f"{name}.offsets")
+        self.nulls = _map_array(directory, f"{name}.nulls")
+
+    def __len__(self):
+        return len(self.nulls)
+
+    def __getitem__(self, row):
+        if self.nulls[row]:
+            return None
+        return self.text[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+
+class _MappedRecords:
+    """Job records of a snapshot, decoded from its mapped columns on access.
+
+    Records appended after loading are kept in an ordinary list.
+    """
+
+    def __init__(self, directory):
+        self._ids = _map_array(directory, "records.id")
+        self._columns = [_MappedStrings(directory, f"records.{field}") for field in _TEXT_FIELDS]
+        self._appended = []
+
+    def __len__(self):
+        return len(self._ids) + len(self._appended)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if row >= len(self._ids):
+            return self._appended[row - len(self._ids)]
+        return JobRecord(int(self._ids[row]), *(column[row] for column in self._columns))
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def append(self, record):
+        self._appended.append(record)
+
+
+class IndexSnapshots:
+    """Versioned on-disk snapshots of the fitted job index.
+
+    A snapshot is a directory named after the index fit, its version and a
+    hash of its contents. Everything that grows with the catalog is stored
+    as .npy arrays that are memory-mapped read-only when loaded, so every
+    worker process maps the same physical pages instead of holding its own
+    copy: the job and skill matrices, the job records, the vocabulary and
+    IDF weights and the ANN clusters. Only small metadata is pickled. The
+    preprocessed job documents are left out, a refit preprocesses them
+    again.
+
+    CURRENT names the snapshot in use and is replaced atomically, so a
+    reader sees either the old or the new snapshot, never half of one.
+    Rows a worker changes later are appended in its own memory as usual.
+    """
+
+    def __init__(self, directory, keep=2):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+        # Name of the snapshot this process loaded or wrote last
+        self.name = None
+
+        self._lock = threading.Lock()
+        self._pending = None
+        self._thread = None
+
+    @contextmanager
+    def writer_lock(self):
+        """Lock held across processes while a snapshot is merged and written"""
+        with open(os.path.join(self.directory, LOCK_FILE), "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def current(self):
+        """Name of the snapshot in use, or None before the first save"""
+        try:
+            with open(os.path.join(self.directory, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def changed(self):
+        """Check whether another process swapped in a newer snapshot"""
+        current = self.current()
+        return current is not None and current != self.name
+
+    def load(self):
+        """Map the current snapshot, or return None if there is none usable"""
+        name = self.current()
+        if name is None:
+            return None
+
+        path = os.path.join(self.directory, name)
+        try:
+            with open(os.path.join(path, "index.pkl"), "rb") as f:
+                meta = pickle.load(f)
+            if meta["taxonomy"] != taxonomy_version():
+                # The jobs' skills are ids of another skill taxonomy
+                print(f"Index snapshot {name} was built with another skill taxonomy")
+                return None
+
+            state = meta["state"]
+            for matrix in _MATRICES:
+                state[matrix] = _map_matrix(path, matrix, meta["shapes"][matrix])
+            for array in _ARRAYS:
+                state[array] = _map_array(path, array)
+            for array in _COPIED_ARRAYS:
+                state[array] = np.array(_map_array(path, array))
+            state['records'] = _MappedRecords(path)
+            state['documents'] = [None] * len(state['records'])
+
+            vectorizer = state['vectorizer']
+            if vectorizer is not None:
+                terms = _MappedStrings(path, "vocabulary")
+                # transform() needs a dict, only it is private to the process
+                vectorizer.vocabulary_ = {terms[column]: column for column in range(len(terms))}
+                vectorizer._tfidf.idf_ = _map_array(path, "idf")
+
+            ann = state['ann']
+            if ann is not None:
+                for array in _ANN_ARRAYS:
+                    setattr(ann, array, _map_array(path, f"ann{array}"))
+        except (OSError, pickle.PickleError, EOFError, KeyError, ValueError) as e:
+            print(f"Could not load index snapshot {name}: {e}")
+            return None
+
+        job_index = JobIndex.__new__(JobIndex)
+        job_index.__setstate__(state)
+        job_index._index_records()
+        self.name = name
+        return job_index
+
+    def save(self, job_index):
+        """Write a snapshot of `job_index` and make it the current one"""
+        with job_index.lock:
+            # Serialize while no job is being added; the matrices are replaced, never changed
+            state = job_index.__getstate__()
+            for array in _COPIED_ARRAYS + ("skill_ids",):
+                # Changed in place by later upserts and removals
+                state[array] = state[array].copy()
+        n_records = len(state['records'])
+
+        arrays = {array: state.pop(array) for array in _ARRAYS + _COPIED_ARRAYS}
+        matrices = {matrix: state.pop(matrix) for matrix in _MATRICES}
+        records = state.pop('records')
+        for key in _REBUILT + ("documents",):
+            state.pop(key)
+
+        vectorizer = state['vectorizer']
+        if vectorizer is not None:
+            # Vocabulary and IDF weights are stored as arrays; terms cut by
+            # max_features are only kept for introspection, and can be huge
+            vocabulary, idf = vectorizer.vocabulary_, vectorizer.idf_
+            state['vectorizer'] = vectorizer = copy.copy(vectorizer)
+            vectorizer._tfidf = copy.copy(vectorizer._tfidf)
+            for attribute in ('vocabulary_', 'stop_words_'):
+                vectorizer.__dict__.pop(attribute, None)
+            del vectorizer._tfidf.idf_
+
+        ann = state['ann']
+        if ann is not None:
+            state['ann'] = ann = copy.copy(ann)
+            ann_arrays = {array: ann.__dict__.pop(array) for array in _ANN_ARRAYS}
+
+        meta = {
+            "taxonomy": taxonomy_version(),
+            "shapes": {matrix: value.shape for matrix, value in matrices.items()},
+            "state": state
+        }
+        pickled = pickle.dumps(meta, protocol=pickle.HIGHEST_PROTOCOL)
+
+        tmp_path = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        try:
+            digest = hashlib.sha256(pickled)
+            for matrix, value in matrices.items():
+                _save_matrix(tmp_path, matrix, value, digest)
+            for array, value in arrays.items():
+                _save_array(tmp_path, array, value, digest)
+
+            rows = range(n_records)
+            _save_array(tmp_path, "records.id", np.fromiter((records[row].id for row in rows),
+                                                            dtype=np.int64, count=n_records), digest)
+            for position, field in enumerate(_TEXT_FIELDS, start=1):
+                _save_strings(tmp_path, f"records.{field}", [records[row][position] for row in rows], digest)
+
+            if vectorizer is not None:
+                _save_strings(tmp_path, "vocabulary", sorted(vocabulary, key=vocabulary.get), digest)
+                _save_array(tmp_path, "idf", idf, digest)
+            if ann is not None:
+                for array, value in ann_arrays.items():
+                    _save_array(tmp_path, f"ann{array}", value, digest)
+
+            with open(os.path.join(tmp_path, "index.pkl"), "wb") as f:
+                f.write(pickled)
+
+            # Named after the contents, so a snapshot of that name is this very snapshot
+            name = f"{job_index.fit_id}-{state['version']}-{digest.hexdigest()[:16]}"
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                shutil.rmtree(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+
+            fd, tmp_current = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                f.write(name)
+            os.replace(tmp_current, os.path.join(self.directory, CURRENT_FILE))
+        except OSError as e:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            print(f"Could not save index snapshot: {e}")
+            return None
+
+        self.name = name
+        self._prune(name)
+        return name
+
+    def save_later(self, write):
+        """Run `write()` in the background; calls made while it runs are folded into one more run"""
+        with self._lock:
+            self._pending = write
+            if self._thread is None or not self._thread.is_alive():
+                # Not a daemon: a snapshot being written is finished before exit
+                self._thread = threading.Thread(target=self._run)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                write, self._pending = self._pending, None
+                if write is None:
+                    self._thread = None
+                    return
+            try:
+                write()
+            except Exception as e:
+                print(f"Could not save index snapshot: {e}")
+
+    def _prune(self, current):
+        """Delete all but the `keep` newest snapshots; mapped files stay readable until unmapped"""
+        snapshots = []
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and not entry.name.startswith("."):
+                snapshots.append((entry.stat().st_mtime, entry.name))
+
+        for _, name in sorted(snapshots, reverse=True)[self.keep:]:
+            if name != current:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
@@ -0,0 +1,269 @@
+# ingest_jobs.py
+"""Load a job feed (CSV, JSON lines or a JSON array) into the jobs table.
+
+Run from the job_matcher_app directory:
+
+    python ingest_jobs.py feeds/partner.jsonl --source partner --chunk-size 5000
+
+Rows are read and written in chunks, upserted by their external key, and
+the matching index is refitted once at the end.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from itertools import islice
+
+from sqlalchemy import bindparam, inspect, text
+
+from job_index import parse_skills
+from models import db, Job, JobMatch
+
+# Default number of feed rows upserted per transaction
+CHUNK_SIZE = 5000
+
+# Feed column names accepted for each Job field, first match wins
+FIELD_ALIASES = {
+    "external_id": ("external_id", "job_id", "id", "key", "reference"),
+    "title": ("title", "job_title"),
+    "company": ("company", "company_name", "employer"),
+    "location": ("location", "city"),
+    "description": ("description", "job_description"),
+    "required_skills": ("required_skills", "skills"),
+}
+
+_COLUMNS = ("title", "company", "location", "description", "required_skills")
+
+# External keys looked up per SELECT, below SQLite's bound parameter limit
+_LOOKUP_SIZE = 500
+
+
+def iter_feed(path):
+    """Yield the raw rows of a feed one at a time, whatever its format"""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            # Unquoted skill lists spill over into extra columns, they are skills too
+            for row in csv.DictReader(f, restkey="_extra"):
+                extra = row.pop("_extra", None)
+                if extra:
+                    last = list(row)[-1]
+                    row[last] = ",".join([row[last] or ""] + extra)
+                yield row
+
+    elif path.endswith(".json"):
+        # A plain JSON array has to be read whole, prefer JSON lines for big feeds
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f)
+
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def normalize_job(raw, source=None):
+    """Map a raw feed row onto Job columns, or None if it has no title"""
+    job = {}
+    for field, aliases in FIELD_ALIASES.items():
+        value = next((raw[alias] for alias in aliases if raw.get(alias) not in (None, "")), None)
+        job[field] = value.strip() if isinstance(value, str) else value
+
+    if not job["title"]:
+        return None
+
+    skills = job["required_skills"]
+    if isinstance(skills, (list, tuple)):
+        skills = ",".join(skills)
+    job["required_skills"] = ",".join(parse_skills(skills))
+
+    key = job["external_id"]
+    if key is None:
+        # Feeds without ids are keyed on what identifies a posting
+        identity = "|".join(str(job[field] or "").lower() for field in ("title", "company", "location"))
+        key = hashlib.sha1(identity.encode("utf-8")).hexdigest()
+    job["external_id"] = f"{source}:{key}" if source else str(key)
+    return job
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ensure_external_id():
+    """Add the jobs.external_id column and its unique index to older databases"""
+    columns = {column["name"] for column in inspect(db.engine).get_columns(Job.__tablename__)}
+    if "external_id" not in columns:
+        with db.engine.begin() as connection:
+            connection.execute(text("ALTER TABLE jobs ADD COLUMN external_id VARCHAR(200)"))
+    for index in Job.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+def upsert_jobs(jobs):
+    """Insert or update one chunk of normalized jobs with batched statements.
+
+    Returns (inserted, updated, unchanged) counts.
+    """
+    # Later rows of the same key win
+    by_key = {job["external_id"]: job for job in jobs}
+    table = Job.__table__
+
+    existing = {}
+    for keys in chunked(by_key, _LOOKUP_SIZE):
+        existing.update((row.external_id, row) for row in db.session.execute(
+            db.select(table.c.id, table.c.external_id, *(table.c[column] for column in _COLUMNS))
+            .where(table.c.external_id.in_(keys))
+        ))
+
+    inserts, updates = [], []
+    for key, job in by_key.items():
+        row = existing.get(key)
+        if row is None:
+            inserts.append(job)
+        elif any(getattr(row, column) != job[column] for column in _COLUMNS):
+            updates.append(dict({f"new_{column}": job[column] for column in _COLUMNS}, job_id=row.id))
+
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+    if updates:
+        db.session.execute(
+            table.update().where(table.c.id == bindparam("job_id"))
+            .values({column: bindparam(f"new_{column}") for column in _COLUMNS}),
+            updates
+        )
+    db.session.commit()
+
+    return len(inserts), len(updates), len(by_key) - len(inserts) - len(updates)
+
+
+def ingest(path, source=None, chunk_size=CHUNK_SIZE, seen=None):
+    """Stream a feed into the jobs table, returns the (inserted, updated, unchanged, skipped) counts.
+
+    The external keys of the feed's jobs are added to the set `seen` if given.
+    """
+    ensure_external_id()
+    totals = [0, 0, 0, 0]
+
+    for raw_rows in chunked(iter_feed(path), chunk_size):
+        jobs = [job for job in (normalize_job(raw, source) for raw in raw_rows) if job is not None]
+        totals[3] += len(raw_rows) - len(jobs)
+        if seen is not None:
+            seen.update(job["external_id"] for job in jobs)
+        if jobs:
+            for i, count in enumerate(upsert_jobs(jobs)):
+                totals[i] += count
+        print(f"{sum(totals)} rows read...")
+
+    return tuple(totals)
+
+
+def remove_missing_jobs(source, seen):
+    """Delete the jobs of a source whose external key is not in `seen`, returns how many.
+
+    Jobs still referenced by legacy job_matches rows are kept until those
+    rows are migrated to match_runs.
+    """
+    table = Job.__table__
+    referenced = db.select(JobMatch.job_id)
+    rows = db.session.execute(
+        db.select(table.c.id, table.c.external_id)
+        .where(table.c.external_id.startswith(f"{source}:", autoescape=True))
+        .where(table.c.id.not_in(referenced))
+    ).all()
+    removed = [row.id for row in rows if row.external_id not in seen]
+
+    for ids in chunked(removed, _LOOKUP_SIZE):
+        db.session.execute(table.delete().where(table.c.id.in_(ids)))
+    db.session.commit()
+    return len(removed)
+
+
+def refresh_index(matcher):
+    """Refit the matching index over the whole catalog in one pass"""
+    table = Job.__table__
+    jobs = db.session.execute(db.select(
+        table.c.id, table.c.title, table.c.company, table.c.location,
+        table.c.description, table.c.required_skills
+    )).all()
+    return matcher.build_index(jobs)
+
+
+class JobFileWatcher:
+    """Keeps the jobs table in step with a job file that is edited by hand.
+
+    The file is only re-read when its mtime or size changed, and only
+    ingested when its SHA-256 changed as well. Jobs of the source that were
+    removed from the file are deleted.
+    """
+
+    def __init__(self, path, source="file"):
+        self.path = path
+        self.source = source
+        self._signature = None
+        self._digest = None
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Ingest the file if it changed since the last check, returns True if any job changed"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+
+        with self._lock:
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self._signature:
+                return False
+            self._signature = signature
+
+            with open(self.path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            if digest == self._digest:
+                return False
+            self._digest = digest
+
+            seen = set()
+            try:
+                inserted, updated, _, _ = ingest(self.path, self.source, seen=seen)
+                removed = remove_missing_jobs(self.source, seen)
+            except (OSError, ValueError) as e:
+                db.session.rollback()
+                print(f"Could not load jobs from {self.path}: {e}")
+                return False
+            return bool(inserted or updated or removed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--source", help="prefix of the external keys, e.g. the partner name")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    from app import app, matcher
+
+    with app.app_context():
+        db.create_all()
+
+        start = time.perf_counter()
+        inserted, updated, unchanged, skipped = ingest(args.path, args.source, args.chunk_size)
+        print(f"{inserted} inserted, {updated} updated, {unchanged} unchanged, {skipped} skipped "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        if inserted or updated:
+            start = time.perf_counter()
+            job_index = refresh_index(matcher)
+            print(f"Index of {len(job_index)} jobs built in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,37 @@
 # init_db.py
-from app import app, db
-from models import User, Job, UserSkill
+from app import app, db, matcher, ensure_admin_role
+from models import User, Job
+from match_history import migrate_job_matches, rebuild_user_stats
+from ingest_jobs import ensure_external_id
+from user_skills import ensure_skill_ids, rekey_skills, sync_user_skills
 from datetime import datetime
 
 with app.app_context():
     # Create all tables
     db.create_all()
     
+    # Feeds upsert jobs by their external key
+    ensure_external_id()
+    
+    # Users listed in ADMIN_EMAILS may see the candidates of a job
+    granted = ensure_admin_role(app.config['ADMIN_EMAILS'])
+    if granted:
+        print(f"Admin role given to {granted} user(s)!")
+    
+    # User skills point into the shared skills dictionary
+    ensure_skill_ids()
+    
+    # Skills saved under aliases the taxonomy no longer has move to their canonical skill
+    rekeyed = rekey_skills()
+    if rekeyed:
+        print(f"{rekeyed} user skills re-keyed to the skill taxonomy!")
+    
+    # Pack the match history of older databases into one row per upload
+    migrated = migrate_job_matches()
+    if migrated:
+        print(f"Match history migrated to {migrated} match runs!")
+    rebuild_user_stats()
+    
     # Add sample jobs if none exists
     if Job.query.count() == 0:
         sample_jobs = [
@@ -20,7 +45,7 @@ with app.app_context():
                 title="Data Analyst", 
                 company="Data Insights Ltd.", 
                 location="Johannesburg", 
-                required_skills="Excel,SQL,PowerBI,Python"
+                required_skills="Microsoft Excel,SQL,PowerBI,Python"
             ),
             Job(
                 title="Web Developer", 
@@ -41,7 +66,7 @@ with app.app_context():
                 required_skills="Troubleshooting,Windows,Networking,Communication"
             ),
         ]
-        db.session.bulk_save_objects(sample_jobs)
+        db.session.add_all(sample_jobs)
         db.session.commit()
         print("Sample jobs added!")
 
@@ -66,11 +91,13 @@ with app.app_context():
             "Leadership", "Teamwork", "Problem Solving"
         ]
         
-        for skill in skills:
-            user_skill = UserSkill(user_id=user.id, skill_name=skill)
-            db.session.add(user_skill)
-        
+        sync_user_skills(user.id, skills)
         db.session.commit()
         print("User skills added!")
     
+    # Fit the job index once and snapshot it for the web workers
+    if matcher.snapshots is not None:
+        matcher.build_index(Job.query.all())
+        print("Job index snapshot saved!")
+    
     print("Database initialized successfully!")
\ No newline at end of file
@@ -0,0 +1,518 @@
+# job_index.py
+import re
+import threading
+import uuid
+from collections import defaultdict, namedtuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import event
+
+from ann_index import IVFIndex
+from skill_taxonomy import canonical_skills
+
+# Upper bound on the TF-IDF vocabulary fitted over the whole catalog
+MAX_FEATURES = 20000
+
+# Words of a job title, for the keyword pre-filter
+_TITLE_WORD_RE = re.compile(r"\w+")
+
+# Plain snapshot of a job row, safe to keep after the SQLAlchemy session closes
+JobRecord = namedtuple(
+    "JobRecord",
+    ["id", "title", "company", "location", "description", "required_skills"]
+)
+
+
+def make_vectorizer(max_features=MAX_FEATURES):
+    """Create the TF-IDF vectorizer used for jobs and CVs"""
+    # scikit-learn is slow to import, only load it once an index is fitted
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    return TfidfVectorizer(
+        stop_words='english',
+        max_features=max_features,
+        ngram_range=(1, 2)
+    )
+
+
+def job_record(job):
+    """Copy the fields the matcher needs from a Job (or Job-like) object"""
+    return JobRecord(
+        id=job.id,
+        title=job.title or "",
+        company=getattr(job, 'company', None),
+        location=getattr(job, 'location', None) or "",
+        description=getattr(job, 'description', None),
+        required_skills=job.required_skills or ""
+    )
+
+
+def parse_skills(required_skills):
+    """Split a comma-separated skills string into distinct lowercase skills"""
+    skills = (skill.strip().lower() for skill in (required_skills or "").split(','))
+    return tuple(dict.fromkeys(skill for skill in skills if skill))
+
+
+def job_skills(job):
+    """Canonical skills (see skill_taxonomy) a job requires"""
+    return canonical_skills(parse_skills(job.required_skills))
+
+
+def normalize_location(location):
+    """Lowercase a location and collapse its whitespace"""
+    return " ".join((location or "").lower().split())
+
+
+def job_document(job):
+    """Build the text that represents a job in the TF-IDF space"""
+    # Create job description from title and required skills
+    document = f"{job.title} {job.required_skills}"
+
+    # Add description if it exists
+    if job.description:
+        document += f" {job.description}"
+
+    return document
+
+
+def _product(matrix, vector, rows=None):
+    """matrix @ vector, restricted to `rows` when given"""
+    if rows is None:
+        return matrix @ vector
+
+    # Slicing copies the selected rows, only worth it for a small subset
+    if len(rows) * 2 < matrix.shape[0]:
+        return matrix[rows] @ vector
+    return (matrix @ vector)[rows]
+
+
+def _block_product(block, matrix, rows=None):
+    """Dense block @ matrix.T, one column per row of `matrix` (or per given row)"""
+    # Same trade-off as _product: selecting columns of the dense result copies
+    # block x jobs scores, slicing the job matrix copies the rows themselves
+    if rows is not None and len(rows) * 2 < matrix.shape[0]:
+        return (block @ matrix[rows].T).toarray()
+
+    scores = (block @ matrix.T).toarray()
+    return scores if rows is None else scores[:, rows]
+
+
+class JobIndex:
+    """Pre-fitted TF-IDF index over the job catalog.
+
+    The vectorizer vocabulary and IDF weights are fitted once over every job
+    and the job vectors are kept in a sparse matrix, so scoring a CV against
+    the catalog is a single transform plus one sparse matrix-vector product.
+
+    Jobs added or edited after the fit are transformed with the existing
+    vocabulary and appended as new rows; replaced and deleted jobs are
+    tombstoned. The IDF weights stay frozen until the next refit.
+    """
+
+    def __init__(self, vectorizer, matrix, records, documents):
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.records = list(records)
+        # Only needed to refit; None for the rows of a loaded snapshot
+        self.documents = list(documents)
+        self.alive = np.ones(len(self.records), dtype=bool)
+        self._index_records()
+
+        # Binary job x skill matrix, see _index_records for each job's skills
+        self.skill_ids = {}
+        self.skill_matrix = self._encode_skills(self.job_skills)
+        self.skill_counts = np.array([len(skills) for skills in self.job_skills], dtype=np.float64)
+        self.version = 0
+        self.lock = threading.RLock()
+
+        # Identifies this fit: CV vectors are only reusable within the same vocabulary
+        self.fit_id = uuid.uuid4().hex
+
+        # Rows appended since the last consolidation of the job and skill matrices
+        self._appended = []
+        self._appended_skills = []
+
+        # Document frequencies at fit time and now, used to measure IDF drift
+        self._fitted_rows = len(self.records)
+        self._changes = 0
+        self._fitted_df = self._document_frequencies(matrix)
+        self._df = self._fitted_df.copy()
+
+        # Changes recorded while a background refit is running
+        self._journal = None
+
+        # Optional approximate nearest-neighbour stage for very large catalogs
+        self.ann = None
+
+    def __getstate__(self):
+        # Locks cannot be pickled, e.g. when the index is handed to a worker process
+        with self.lock:
+            self._consolidate()
+            state = self.__dict__.copy()
+        del state['lock']
+        state['_journal'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    @classmethod
+    def build(cls, jobs, preprocess):
+        """Fit the vocabulary and IDF weights over all jobs"""
+        records = [job_record(job) for job in jobs]
+        documents = [preprocess(job_document(record)) for record in records]
+        return cls.fit(records, documents)
+
+    @classmethod
+    def fit(cls, records, documents):
+        """Fit a new index from records and their preprocessed documents"""
+        vectorizer = make_vectorizer()
+        try:
+            matrix = vectorizer.fit_transform(documents).tocsr()
+        except ValueError:
+            # Empty catalog or no usable terms - nothing can score above zero
+            vectorizer = None
+            matrix = sparse.csr_matrix((len(records), 0))
+
+        return cls(vectorizer, matrix, records, documents)
+
+    @staticmethod
+    def _document_frequencies(matrix):
+        return np.bincount(matrix.indices, minlength=matrix.shape[1]).astype(np.int64)
+
+    def _encode_skills(self, job_skills):
+        """One sparse binary row per job, growing the skill vocabulary as needed"""
+        indptr = [0]
+        indices = []
+        for skills in job_skills:
+            for skill in skills:
+                indices.append(self.skill_ids.setdefault(skill, len(self.skill_ids)))
+            indptr.append(len(indices))
+
+        return sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float64), indices, indptr),
+            shape=(len(job_skills), len(self.skill_ids))
+        )
+
+    def _index_records(self):
+        """Build the per-row lookups of the records, also used to restore a snapshot"""
+        self.row_of = {self.records[row].id: int(row) for row in np.flatnonzero(self.alive)}
+
+        # Each job's canonical skills in posting order
+        self.job_skills = [job_skills(record) for record in self.records]
+
+        # Inverted indexes for the keyword and location filters; tombstoned rows
+        # stay in them and are masked out by `alive`
+        self.title_postings = defaultdict(list)
+        self.location_postings = defaultdict(list)
+        for row, record in enumerate(self.records):
+            self._index_filters(row, record)
+
+    def _index_filters(self, row, record):
+        for word in set(_TITLE_WORD_RE.findall(record.title.lower())):
+            self.title_postings[word].append(row)
+        self.location_postings[normalize_location(record.location)].append(row)
+
+    @property
+    def index_version(self):
+        """Changes whenever the scores of a CV against the catalog may change"""
+        return (self.fit_id, self.version)
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def live_rows(self):
+        """Row numbers of all jobs that are not tombstoned"""
+        with self.lock:
+            return np.flatnonzero(self.alive)
+
+    def live_records(self):
+        """JobRecords of all jobs that are not tombstoned, in row order"""
+        with self.lock:
+            return [self.records[row] for row in np.flatnonzero(self.alive)]
+
+    def filter_mask(self, keyword=None, location=None):
+        """Boolean mask of live rows whose title contains `keyword` and
+        whose location contains `location` (case-insensitive substrings).
+
+        Only the distinct locations and title words are scanned, never the
+        jobs themselves.
+        """
+        with self.lock:
+            mask = self.alive.copy()
+
+            if location:
+                query = normalize_location(location)
+                selected = np.zeros(len(mask), dtype=bool)
+                for job_location, rows in self.location_postings.items():
+                    if query in job_location:
+                        selected[rows] = True
+                mask &= selected
+
+            if keyword:
+                query = keyword.lower()
+                words = set(_TITLE_WORD_RE.findall(query))
+
+                # Every word of the keyword sits inside some word of a matching title
+                for word in words:
+                    selected = np.zeros(len(mask), dtype=bool)
+                    for title_word, rows in self.title_postings.items():
+                        if word in title_word:
+                            selected[rows] = True
+                    mask &= selected
+
+                # Confirm the exact substring on the few remaining titles
+                if words != {query}:
+                    for row in np.flatnonzero(mask):
+                        if query not in self.records[row].title.lower():
+                            mask[row] = False
+
+            return mask
+
+    def covers(self, jobs):
+        """Check that every job is already indexed"""
+        return all(job.id in self.row_of for job in jobs)
+
+    def rows_for(self, jobs):
+        """Map jobs to their row numbers in the job matrix"""
+        return np.fromiter((self.row_of[job.id] for job in jobs),
+                           dtype=np.int64, count=len(jobs))
+
+    def transform(self, processed_texts):
+        """Vectorize preprocessed texts with the fitted vocabulary"""
+        if self.vectorizer is None:
+            return sparse.csr_matrix((len(processed_texts), 0))
+        return self.vectorizer.transform(processed_texts)
+
+    def skill_vector(self, skills):
+        """Binary vector of the indexed skills present in `skills`"""
+        vector = np.zeros(len(self.skill_ids))
+        columns = [self.skill_ids[skill] for skill in skills if skill in self.skill_ids]
+        vector[columns] = 1
+        return vector
+
+    def skill_matches(self, skills, rows=None):
+        """Number of each job's required skills found in `skills`, per job row
+        (or for the given rows only)"""
+        with self.lock:
+            self._consolidate()
+            skill_matrix = self.skill_matrix
+            vector = self.skill_vector(skills)
+
+        return _product(skill_matrix, vector[:skill_matrix.shape[1]], rows)
+
+    def similarities(self, processed_cv, rows=None, cv_vector=None):
+        """Cosine similarity of a preprocessed CV against every job row
+        (or against the given rows only). `cv_vector` can pass in the CV's
+        already transformed vector."""
+        with self.lock:
+            self._consolidate()
+            matrix = self.matrix
+
+        if not processed_cv or self.vectorizer is None:
+            return np.zeros(matrix.shape[0] if rows is None else len(rows))
+
+        # Rows are L2-normalised by the vectorizer, so the dot product is the cosine
+        if cv_vector is None:
+            cv_vector = self.transform([processed_cv])
+        return _product(matrix, cv_vector.toarray().ravel(), rows)
+
+    def similarity_matrix(self, processed_cvs, rows=None):
+        """Cosine similarities of many preprocessed CVs at once, one dense
+        row per CV and one column per job row (or per given row)"""
+        with self.lock:
+            self._consolidate()
+            matrix = self.matrix
+
+        n_jobs = matrix.shape[0] if rows is None else len(rows)
+        if self.vectorizer is None:
+            return np.zeros((len(processed_cvs), n_jobs))
+
+        return _block_product(self.transform(processed_cvs), matrix, rows)
+
+    def skill_match_matrix(self, skill_sets, rows=None):
+        """Number of each job's required skills found in each of `skill_sets`,
+        one dense row per skill set and one column per job row"""
+        with self.lock:
+            self._consolidate()
+            skill_matrix = self.skill_matrix
+            columns = [[self.skill_ids[skill] for skill in skills if skill in self.skill_ids]
+                       for skills in skill_sets]
+
+        indptr = np.cumsum([0] + [len(cv_columns) for cv_columns in columns])
+        indices = [column for cv_columns in columns for column in cv_columns]
+        cv_skills = sparse.csr_matrix((np.ones(len(indices)), indices, indptr),
+                                      shape=(len(skill_sets), skill_matrix.shape[1]))
+
+        return _block_product(cv_skills, skill_matrix, rows)
+
+    def build_ann(self, n_clusters=None):
+        """Cluster the job vectors for approximate candidate retrieval"""
+        with self.lock:
+            self._consolidate()
+            matrix = self.matrix
+
+        ann = IVFIndex.build(matrix, n_clusters)
+
+        with self.lock:
+            # Rows appended while clustering still need a cluster
+            self._consolidate()
+            for row in range(ann.n_rows, self.matrix.shape[0]):
+                ann.add(row, self.matrix[row])
+            self.ann = ann
+        return ann
+
+    def ann_candidates(self, processed_cv, nprobe):
+        """Rows of jobs close to the CV according to the ANN index"""
+        if self.ann is None or not processed_cv or self.vectorizer is None:
+            return None
+        cv_vector = self.transform([processed_cv]).toarray().ravel()
+        return self.ann.candidates(cv_vector, nprobe)
+
+    def _consolidate(self):
+        """Stack appended rows onto the job and skill matrices"""
+        if self._appended:
+            self.matrix = sparse.vstack([self.matrix] + self._appended, format='csr')
+            self._appended = []
+
+        if self._appended_skills:
+            # Earlier rows may predate skills that were added since
+            width = len(self.skill_ids)
+            rows = [sparse.csr_matrix((m.data, m.indices, m.indptr), shape=(m.shape[0], width))
+                    for m in [self.skill_matrix] + self._appended_skills]
+            self.skill_matrix = sparse.vstack(rows, format='csr')
+            self._appended_skills = []
+
+    # -------------------- INCREMENTAL UPDATES --------------------
+
+    def upsert(self, record, document):
+        """Append a new or edited job, tombstoning any previous row"""
+        with self.lock:
+            self._tombstone(record.id)
+
+            row_vector = self.transform([document]).tocsr()
+            self._appended.append(row_vector)
+            if self.ann is not None:
+                self.ann.add(len(self.records), row_vector)
+            self.records.append(record)
+            self.documents.append(document)
+            self.alive = np.append(self.alive, True)
+
+            skills = job_skills(record)
+            self._appended_skills.append(self._encode_skills([skills]))
+            self.job_skills.append(skills)
+            self.skill_counts = np.append(self.skill_counts, len(skills))
+            self._index_filters(len(self.records) - 1, record)
+            self.row_of[record.id] = len(self.records) - 1
+
+            self._df[row_vector.indices] += 1
+            self._changes += 1
+            self.version += 1
+            if self._journal is not None:
+                self._journal.append((record, document))
+
+    def remove(self, job_id):
+        """Tombstone a deleted job"""
+        with self.lock:
+            if self._tombstone(job_id):
+                self._changes += 1
+                self.version += 1
+                if self._journal is not None:
+                    self._journal.append((job_id, None))
+
+    def _tombstone(self, job_id):
+        row = self.row_of.pop(job_id, None)
+        if row is None:
+            return False
+
+        self.alive[row] = False
+        self._df[self._row_terms(row)] -= 1
+        return True
+
+    def _row_terms(self, row):
+        fitted = self.matrix.shape[0]
+        if row < fitted:
+            return self.matrix.indices[self.matrix.indptr[row]:self.matrix.indptr[row + 1]]
+        return self._appended[row - fitted].indices
+
+    def drift(self):
+        """Estimate how stale the frozen IDF weights are (0 = fresh)"""
+        with self.lock:
+            # Share of the catalog added, edited or removed since the fit
+            churn = self._changes / max(self._fitted_rows, 1)
+
+            if not len(self._df):
+                return churn
+
+            # Relative change of the IDF weights if they were refitted now
+            fitted_idf = self._idf(self._fitted_df, self._fitted_rows)
+            current_idf = self._idf(self._df, len(self.row_of))
+            idf_shift = np.abs(current_idf - fitted_idf).mean() / fitted_idf.mean()
+
+            return max(churn, idf_shift)
+
+    @staticmethod
+    def _idf(df, n_docs):
+        # Same smoothing as TfidfVectorizer(smooth_idf=True)
+        return np.log((1 + n_docs) / (1 + np.maximum(df, 0))) + 1
+
+    # -------------------- REFIT --------------------
+
+    def begin_refit(self):
+        """Snapshot the live rows and start journaling later changes"""
+        with self.lock:
+            live = np.flatnonzero(self.alive)
+            self._journal = []
+            return ([self.records[row] for row in live],
+                    [self.documents[row] for row in live])
+
+    def finish_refit(self, fresh):
+        """Replay changes made during the refit onto the fresh index"""
+        with self.lock:
+            journal, self._journal = self._journal or [], None
+
+        for change, document in journal:
+            if document is None:
+                fresh.remove(change)
+            else:
+                fresh.upsert(change, document)
+
+        fresh.version = self.version + 1
+        return fresh
+
+
+def watch_job_changes(session, job_model, on_change):
+    """Report committed inserts, edits and deletes of `job_model` rows.
+
+    `on_change` is called after each commit with a dict mapping job id to a
+    JobRecord, or to None when the job was deleted. Flushes that are rolled
+    back are discarded.
+    """
+
+    def collect(session, flush_context):
+        changes = session.info.setdefault('job_index_changes', {})
+
+        for obj in session.new:
+            if isinstance(obj, job_model):
+                changes[obj.id] = job_record(obj)
+
+        for obj in session.dirty:
+            if isinstance(obj, job_model) and session.is_modified(obj):
+                changes[obj.id] = job_record(obj)
+
+        for obj in session.deleted:
+            if isinstance(obj, job_model):
+                changes[obj.id] = None
+
+    def publish(session):
+        changes = session.info.pop('job_index_changes', None)
+        if changes:
+            on_change(changes)
+
+    def discard(session):
+        session.info.pop('job_index_changes', None)
+
+    event.listen(session, 'after_flush', collect)
+    event.listen(session, 'after_commit', publish)
+    event.listen(session, 'after_rollback', discard)
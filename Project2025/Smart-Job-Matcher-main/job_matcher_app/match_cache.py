@@ -0,0 +1,216 @@
+# match_cache.py
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+# What an uploaded CV boils down to: its raw text, preprocessed text and skills
+CVEntry = namedtuple("CVEntry", ["text", "processed", "skills"])
+
+# Default memory budget of the cache
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+# Default budget of the on-disk CV entries
+MAX_DISK_BYTES = 256 * 1024 * 1024
+
+# How many disk writes between two checks of the disk budget
+_PRUNE_EVERY = 50
+
+
+def cv_key(data):
+    """Content address of an uploaded CV: SHA-256 of its bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _size(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_size(item) for item in value) + 8 * len(value)
+    if hasattr(value, 'data') and hasattr(value, 'indices'):  # sparse vector
+        return value.data.nbytes + value.indices.nbytes
+    return 64
+
+
+class MatchCache:
+    """Content-addressed cache of CV analyses and match scores.
+
+    Entries are keyed by the SHA-256 of the uploaded bytes:
+
+    - ("cv", key): CVEntry with extracted text, preprocessed text and skills,
+      optionally persisted under `directory` so restarts keep them. The
+      skills are canonical ids of one skill taxonomy, so persisted entries
+      are tagged with its `version` and those of other versions are deleted;
+    - ("vector", key, fit_id): the CV's TF-IDF vector for one fitted vocabulary;
+    - ("scores", key, index_version): score arrays over the whole catalog.
+
+    Memory use is bounded by `max_bytes` with least-recently-used eviction.
+    Vectors and scores of older index fits/versions are dropped as soon as
+    a newer one is stored.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, directory=None, max_disk_bytes=MAX_DISK_BYTES, version=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.version = version
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            if version:
+                self._remove_stale()
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._fit_id = None
+        self._index_version = None
+        self._disk_writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # -------------------- MEMORY --------------------
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _put(self, key, value):
+        size = _size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def _drop(self, kind, keep):
+        """Remove entries of one kind whose last key part is not `keep`"""
+        stale = [key for key in self._entries if key[0] == kind and key[-1] != keep]
+        for key in stale:
+            self._bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self._bytes,
+                "hits": self.hits, "misses": self.misses}
+
+    # -------------------- CV ENTRIES --------------------
+
+    def get_cv(self, key):
+        """CVEntry of an upload, from memory or disk"""
+        entry = self._get(("cv", key))
+        if entry is None and self.directory:
+            entry = self._read(key)
+            if entry is not None:
+                self._put(("cv", key), entry)
+        return entry
+
+    def put_cv(self, key, entry):
+        self._put(("cv", key), entry)
+        if self.directory:
+            self._write(key, entry)
+
+    def _suffix(self):
+        return f"-{self.version}.pkl" if self.version else ".pkl"
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self._suffix())
+
+    def _remove_stale(self):
+        """Delete persisted entries written under another version"""
+        suffix = self._suffix()
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl") and not name.endswith(suffix):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return CVEntry(*pickle.load(f))
+        except (OSError, pickle.PickleError, EOFError, TypeError):
+            return None
+
+    def _write(self, key, entry):
+        try:
+            # Write to a temporary file first so readers never see half an entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(tuple(entry), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Could not persist CV cache entry: {e}")
+            return
+
+        self._disk_writes += 1
+        if self._disk_writes % _PRUNE_EVERY == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Delete the oldest persisted entries once over the disk budget"""
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    # -------------------- VECTORS AND SCORES --------------------
+
+    def get_vector(self, key, fit_id):
+        return self._get(("vector", key, fit_id))
+
+    def put_vector(self, key, fit_id, vector):
+        with self._lock:
+            if fit_id != self._fit_id:
+                # A refit changed the vocabulary, older vectors are useless now
+                self._drop("vector", fit_id)
+                self._fit_id = fit_id
+        self._put(("vector", key, fit_id), vector)
+
+    def get_scores(self, key, index_version):
+        return self._get(("scores", key, index_version))
+
+    def put_scores(self, key, index_version, scores):
+        with self._lock:
+            if index_version != self._index_version:
+                # The job index changed, scores against older versions are stale
+                self._drop("scores", index_version)
+                self._index_version = index_version
+        self._put(("scores", key, index_version), scores)
@@ -0,0 +1,329 @@
+# match_history.py
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from history_codec import decode_job_ids, decode_matches, encode_matches
+from models import db, Job, JobMatch, MatchRun, UserStats
+
+# Default number of uploads written per INSERT by the write-behind thread
+HISTORY_BATCH_SIZE = 500
+
+# Default number of seconds queued history rows may wait before being written
+HISTORY_FLUSH_INTERVAL = 2.0
+
+# Default number of uploads shown per history page
+HISTORY_PAGE_SIZE = 20
+
+# Legacy JobMatch rows of one upload were stamped one by one, this far apart at most
+_LEGACY_RUN_GAP = timedelta(seconds=5)
+
+# Legacy rows migrated per transaction; one user's rows are never split
+_MIGRATE_CHUNK_ROWS = 10000
+
+# Ids per DELETE of migrated rows, below SQLite's bound parameter limit
+_DELETE_SIZE = 500
+
+
+def match_run_row(user_id, cv_filename, results, limit=None, min_score=None, matched_on=None):
+    """Plain MatchRun row for the results worth keeping, or None if none are.
+
+    `results` are match summaries (see matching_algorithm.match_summary),
+    already sorted best first. Only the first `limit` results scoring at
+    least `min_score` are kept.
+    """
+    kept = [match for match in results if min_score is None or match["match_score"] >= min_score]
+    if limit:
+        kept = kept[:limit]
+    if not kept:
+        return None
+
+    row = {
+        "user_id": user_id,
+        "matched_on": matched_on or datetime.utcnow(),
+        "cv_filename": cv_filename,
+        "n_matches": len(kept),
+        "best_score": max(match["match_score"] for match in kept)
+    }
+    row.update(encode_matches(kept))
+    return row
+
+
+def insert_match_runs(rows):
+    """Write history rows with a single executemany INSERT, bypassing the ORM unit of work"""
+    if not rows:
+        return
+    db.session.execute(MatchRun.__table__.insert(), rows)
+    update_user_stats(rows)
+    db.session.commit()
+
+
+def update_user_stats(rows):
+    """Fold new MatchRun rows into their users' UserStats, in the caller's transaction"""
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row["user_id"], []).append(row)
+
+    for user_id, user_rows in by_user.items():
+        # Lock the counters so concurrent writers do not lose each other's updates
+        stats = UserStats.query.filter_by(user_id=user_id).with_for_update().first()
+        if stats is None:
+            # Two first uploads may race to create the row: only the savepoint
+            # of the loser is rolled back, never the caller's match runs
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(UserStats.__table__.insert().values(user_id=user_id))
+            except IntegrityError:
+                pass
+            stats = UserStats.query.filter_by(user_id=user_id).with_for_update().populate_existing().one()
+
+        for row in user_rows:
+            matches = decode_matches(row["job_ids"], row["scores"], row["skills"], row["skill_bits"])
+            stats.record(row["matched_on"], row["cv_filename"], matches)
+
+
+def rebuild_user_stats():
+    """Recompute every UserStats row from the stored match runs"""
+    UserStats.query.delete(synchronize_session=False)
+
+    # Counters are added once the scan is over, no flush interrupts the cursor
+    all_stats = []
+    runs = MatchRun.query.order_by(MatchRun.user_id, MatchRun.matched_on).yield_per(1000)
+    for run in runs:
+        if not all_stats or all_stats[-1].user_id != run.user_id:
+            all_stats.append(UserStats(user_id=run.user_id))
+        all_stats[-1].record(run.matched_on, run.cv_filename, run.matches())
+
+    db.session.add_all(all_stats)
+    db.session.commit()
+
+
+def user_stats(user_id):
+    """A user's match stats as a dict, one primary key lookup"""
+    stats = db.session.get(UserStats, user_id)
+    return (stats or UserStats(user_id=user_id)).to_dict()
+
+
+def encode_cursor(run):
+    """Keyset cursor pointing just past `run` in newest-first order"""
+    return f"{run.matched_on.isoformat()}_{run.id}"
+
+
+def decode_cursor(cursor):
+    """(matched_on, id) of a history cursor, or None if it is malformed"""
+    try:
+        matched_on, run_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(matched_on), int(run_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def history_page(user_id, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """One page of a user's uploads, newest first, with their matches.
+
+    Pages are read with keyset pagination on (matched_on, id), so any page
+    is a single range scan of the (user_id, matched_on, id) index. Job titles
+    of the whole page come from one extra query. Returns the runs as dicts
+    and the cursor of the next page (None on the last page).
+    """
+    query = MatchRun.query.filter(MatchRun.user_id == user_id)
+
+    after = decode_cursor(cursor) if cursor else None
+    if after is not None:
+        matched_on, run_id = after
+        query = query.filter(db.or_(
+            MatchRun.matched_on < matched_on,
+            db.and_(MatchRun.matched_on == matched_on, MatchRun.id < run_id)
+        ))
+
+    runs = query.order_by(MatchRun.matched_on.desc(), MatchRun.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(runs[limit - 1]) if len(runs) > limit else None
+    runs = runs[:limit]
+
+    job_ids = {job_id for run in runs for job_id in decode_job_ids(run.job_ids)}
+    jobs = {}
+    if job_ids:
+        jobs = {job.id: job for job in
+                db.session.query(Job.id, Job.title, Job.company, Job.location).filter(Job.id.in_(job_ids))}
+
+    page = []
+    for run in runs:
+        matches = []
+        for match in run.matches():
+            job = jobs.get(match["job_id"])
+            match.update({
+                "title": job.title if job else "Job no longer listed",
+                "company": job.company if job else None,
+                "location": job.location if job else None
+            })
+            matches.append(match)
+
+        page.append({
+            "id": run.id,
+            "matched_on": run.matched_on,
+            "cv_filename": run.cv_filename,
+            "n_matches": run.n_matches,
+            "best_score": run.best_score,
+            "matches": matches
+        })
+
+    return page, next_cursor
+
+
+def migrate_job_matches():
+    """Move the rows of the old per-match table into packed MatchRun rows.
+
+    Matches of one upload share the user and CV filename and were saved
+    within a few seconds of each other. Users are migrated a few at a time,
+    about _MIGRATE_CHUNK_ROWS rows per transaction, so the table is never
+    loaded whole. Also creates the composite index of job_matches on
+    databases created before it existed. Returns the number of runs written.
+    """
+    for index in JobMatch.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+    counts = db.session.execute(
+        db.select(JobMatch.user_id, db.func.count()).group_by(JobMatch.user_id).order_by(JobMatch.user_id)
+    ).all()
+
+    written, users, n_rows = 0, [], 0
+    for user_id, count in counts:
+        users.append(user_id)
+        n_rows += count
+        if n_rows >= _MIGRATE_CHUNK_ROWS:
+            written += _migrate_users(users)
+            users, n_rows = [], 0
+    if users:
+        written += _migrate_users(users)
+    return written
+
+
+def _migrate_users(user_ids):
+    """Migrate the legacy rows of some users in one transaction"""
+    table = JobMatch.__table__
+    legacy = db.session.execute(
+        db.select(table.c.id, table.c.user_id, table.c.cv_filename, table.c.matched_on, table.c.job_id,
+                  table.c.match_score, table.c.skills_matched, table.c.skills_missing)
+        .where(table.c.user_id.in_(user_ids))
+        .order_by(table.c.user_id, table.c.cv_filename, table.c.matched_on, table.c.id)
+    ).all()
+    if not legacy:
+        return 0
+
+    groups = []
+    for match in legacy:
+        last = groups[-1][-1] if groups else None
+        if (last is None or last.user_id != match.user_id or last.cv_filename != match.cv_filename
+                or not (last.matched_on and match.matched_on)
+                or match.matched_on - last.matched_on > _LEGACY_RUN_GAP):
+            groups.append([])
+        groups[-1].append(match)
+
+    rows = []
+    for group in groups:
+        results = sorted(({
+            "id": match.job_id,
+            "match_score": match.match_score,
+            "skills_matched": [skill for skill in (match.skills_matched or "").split(",") if skill],
+            "skills_missing": [skill for skill in (match.skills_missing or "").split(",") if skill]
+        } for match in group), key=lambda result: -result["match_score"])
+        rows.append(match_run_row(group[0].user_id, group[0].cv_filename, results,
+                                  matched_on=group[0].matched_on))
+
+    db.session.execute(MatchRun.__table__.insert(), rows)
+    ids = [match.id for match in legacy]
+    for start in range(0, len(ids), _DELETE_SIZE):
+        db.session.execute(table.delete().where(table.c.id.in_(ids[start:start + _DELETE_SIZE])))
+    db.session.commit()
+    return len(rows)
+
+
+class HistoryWriter:
+    """Persists match history in bulk.
+
+    By default the rows of an upload are inserted before the request returns.
+    Each upload is one packed MatchRun row. With MATCH_HISTORY_WRITE_BEHIND
+    the rows are queued instead, and a background thread writes the rows of
+    many uploads together, every MATCH_HISTORY_FLUSH_INTERVAL seconds or
+    MATCH_HISTORY_BATCH_SIZE uploads.
+    Queued rows show up in the history once written.
+    """
+
+    def __init__(self, app=None):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MATCH_HISTORY_LIMIT', None)  # None or 0 keeps every result
+        app.config.setdefault('MATCH_HISTORY_MIN_SCORE', None)
+        app.config.setdefault('MATCH_HISTORY_WRITE_BEHIND', False)
+        app.config.setdefault('MATCH_HISTORY_BATCH_SIZE', HISTORY_BATCH_SIZE)
+        app.config.setdefault('MATCH_HISTORY_FLUSH_INTERVAL', HISTORY_FLUSH_INTERVAL)
+
+        self.app = app
+        app.extensions['history_writer'] = self
+
+    def save(self, user_id, cv_filename, results):
+        """Store the matches of one upload, returns the number of matches kept"""
+        row = match_run_row(user_id, cv_filename, results,
+                            self.app.config['MATCH_HISTORY_LIMIT'],
+                            self.app.config['MATCH_HISTORY_MIN_SCORE'])
+        if row is None:
+            return 0
+
+        if self.app.config['MATCH_HISTORY_WRITE_BEHIND']:
+            self._start()
+            self._queue.put(row)
+        else:
+            insert_match_runs([row])
+        return row["n_matches"]
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                atexit.register(self.flush)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _take(self, wait, batch=None):
+        """Collect queued rows for up to `wait` seconds, or until the batch is full"""
+        batch_size = self.app.config['MATCH_HISTORY_BATCH_SIZE']
+        deadline = time.monotonic() + wait
+        batch = batch or []
+        while len(batch) < batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self.app.app_context():
+            try:
+                insert_match_runs(batch)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Saving {len(batch)} match history rows failed: {e}")
+
+    def _run(self):
+        interval = self.app.config['MATCH_HISTORY_FLUSH_INTERVAL']
+        while True:
+            # Sleep until an upload queues rows, then give others time to join them
+            row = self._queue.get()
+            self._write(self._take(interval, [row]))
+
+    def flush(self):
+        """Write every queued row now, e.g. at shutdown"""
+        while True:
+            batch = self._take(0)
+            if not batch:
+                return
+            self._write(batch)
@@ -0,0 +1,173 @@
+# match_queue.py
+import json
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+
+from sqlalchemy import literal
+
+from cv_extraction import deadline, extract_and_preprocess
+from index_snapshot import IndexSnapshots
+from matching_algorithm import EnhancedMatcher, match_summary
+from models import db, MatchTask
+
+
+class QueueFull(Exception):
+    """Raised when too many CV matches are already waiting"""
+
+
+# Matcher of a worker process and the snapshots it maps, set up by _init_worker
+_worker_matcher = None
+_worker_snapshots = None
+
+
+def _init_worker(snapshot_dir, job_index=None):
+    global _worker_matcher, _worker_snapshots
+    _worker_matcher = EnhancedMatcher()
+    if snapshot_dir:
+        _worker_snapshots = IndexSnapshots(snapshot_dir)
+    else:
+        _worker_matcher.job_index = job_index
+
+
+def _worker_index():
+    """Map the latest index snapshot if it changed since this worker's last task"""
+    if _worker_snapshots is not None and (_worker_matcher.job_index is None or _worker_snapshots.changed()):
+        job_index = _worker_snapshots.load()
+        if job_index is not None:
+            _worker_matcher.job_index = job_index
+    if _worker_matcher.job_index is None:
+        raise ValueError("The job catalog is still being indexed. Please try again in a moment.")
+
+
+def run_match(data, filename, keyword, location, top_k, min_score, max_pages, timeout):
+    """Extract and match one CV inside a worker process"""
+    _worker_index()
+    with deadline(timeout):
+        cv_text, processed_cv = extract_and_preprocess(data, filename, _worker_matcher.preprocess_text,
+                                                       max_pages)
+    if not cv_text.strip():
+        raise ValueError("Could not extract text from the CV file. Please try a different file format.")
+
+    matches = _worker_matcher.match_jobs(cv_text, None, keyword, location,
+                                         top_k=top_k, min_score=min_score, processed_cv=processed_cv)
+    return [match_summary(match) for match in matches]
+
+
+class MatchQueue:
+    """Background CV matching on a local process pool.
+
+    Each upload becomes a MatchTask row that clients poll with its ticket.
+    The tasks table is shared by all web workers, so the number of pending
+    tasks is bounded across the whole deployment (MATCH_QUEUE_SIZE).
+
+    With index snapshots the pool is started once and its workers map the
+    latest snapshot before each task. Without them every worker holds a
+    pickled copy of the index, and the pool is restarted when it changed.
+    """
+
+    def __init__(self, app=None, matcher=None, on_results=None):
+        self._pool = None
+        self._pool_key = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, matcher, on_results)
+
+    def init_app(self, app, matcher, on_results=None):
+        """`on_results(user_id, cv_filename, results)` persists finished matches"""
+        app.config.setdefault('MATCH_WORKERS', 2)
+        app.config.setdefault('MATCH_QUEUE_SIZE', 16)
+        app.config.setdefault('MATCH_TASK_TIMEOUT', 300)  # seconds
+
+        self.app = app
+        self.matcher = matcher
+        self.on_results = on_results
+        app.extensions['match_queue'] = self
+
+    def _executor(self):
+        snapshots = self.matcher.snapshots
+        job_index = self.matcher.job_index
+
+        with self._lock:
+            if snapshots is not None:
+                key, initargs = snapshots.directory, (snapshots.directory,)
+            else:
+                # Workers hold a copy of the index, start fresh ones when it changes
+                key, initargs = (id(job_index), job_index.version), (None, job_index)
+            if self._pool is None or self._pool_key != key:
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.app.config['MATCH_WORKERS'],
+                    initializer=_init_worker,
+                    initargs=initargs
+                )
+                self._pool_key = key
+            return self._pool
+
+    def pending(self):
+        """Number of tasks still waiting for a result"""
+        return MatchTask.query.filter_by(status='queued').count()
+
+    def expire_stale(self):
+        """Fail tasks that outlived MATCH_TASK_TIMEOUT, e.g. after a worker restart"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.app.config['MATCH_TASK_TIMEOUT'])
+        MatchTask.query.filter(
+            MatchTask.status == 'queued', MatchTask.created_at < cutoff
+        ).update({
+            "status": "failed",
+            "error": "Matching timed out. Please upload your CV again.",
+            "finished_at": datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+
+    def submit(self, user_id, data, filename, keyword, location, top_k, min_score):
+        """Queue a CV for matching and return its ticket"""
+        self.expire_stale()
+
+        # Counted and inserted in one statement, so concurrent uploads cannot overfill the queue
+        ticket = uuid.uuid4().hex
+        table = MatchTask.__table__
+        pending = (db.select(db.func.count()).select_from(table)
+                   .where(table.c.status == 'queued').scalar_subquery())
+        row = db.select(literal(ticket), literal(user_id), literal('queued'), literal(filename),
+                        literal(datetime.utcnow())).where(pending < self.app.config['MATCH_QUEUE_SIZE'])
+        result = db.session.execute(table.insert().from_select(
+            ["id", "user_id", "status", "cv_filename", "created_at"], row))
+        if result.rowcount == 0:
+            db.session.rollback()
+            raise QueueFull()
+        db.session.commit()
+
+        future = self._executor().submit(run_match, data, filename, keyword, location, top_k, min_score,
+                                         self.app.config['CV_MAX_PAGES'], self.app.config['CV_EXTRACT_TIMEOUT'])
+        future.add_done_callback(partial(self._finish, ticket))
+        return ticket
+
+    def _finish(self, ticket, future):
+        # Runs on the pool's management thread, outside any request
+        with self.app.app_context():
+            task = db.session.get(MatchTask, ticket)
+            if task is None:
+                return
+
+            try:
+                results = future.result()
+            except Exception as e:
+                task.status = 'failed'
+                task.error = str(e) or e.__class__.__name__
+            else:
+                task.status = 'done'
+                task.result = json.dumps(results)
+
+            task.finished_at = datetime.utcnow()
+            db.session.commit()
+
+            if task.status == 'done' and results and self.on_results is not None:
+                try:
+                    self.on_results(task.user_id, task.cv_filename, results)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Saving match history for task {ticket} failed: {e}")
@@ -1,145 +1,532 @@
 # matching_algorithm.py
-import re
+import hashlib
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
 import string
 import ssl
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 
-try:
-    _create_unverified_https_context = ssl._create_unverified_context
-except AttributeError:
-    pass
-else:
-    ssl._create_default_https_context = _create_unverified_https_context
+from job_index import JobIndex, job_document, make_vectorizer
+from skill_taxonomy import default_taxonomy
+from stopwords_en import ENGLISH_STOP_WORDS
 
-# Download NLTK data with more error handling
-try:
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    print("Downloading NLTK data...")
+# NLTK and its WordNet corpus are only loaded when the first word is lemmatized
+_wordnet_lemmatizer = None
+_wordnet_lock = threading.Lock()
+
+
+def _download_nltk_data(package):
+    try:
+        _create_unverified_https_context = ssl._create_unverified_context
+    except AttributeError:
+        pass
+    else:
+        ssl._create_default_https_context = _create_unverified_https_context
+    
+    # Download NLTK data with more error handling
+    import nltk
+    print(f"Downloading NLTK data ({package})...")
     try:
-        nltk.download('stopwords')
-        nltk.download('wordnet')
+        nltk.download(package)
         print("NLTK data downloaded successfully.")
     except Exception as e:
         print(f"Failed to download NLTK data: {e}")
 
+
+def wordnet_lemmatizer():
+    """Shared WordNet lemmatizer, created (and its corpus downloaded) on first use"""
+    global _wordnet_lemmatizer
+    if _wordnet_lemmatizer is not None:
+        return _wordnet_lemmatizer
+    
+    with _wordnet_lock:
+        if _wordnet_lemmatizer is None:
+            import nltk
+            from nltk.stem import WordNetLemmatizer
+            try:
+                nltk.data.find('corpora/wordnet')
+            except LookupError:
+                _download_nltk_data('wordnet')
+            _wordnet_lemmatizer = WordNetLemmatizer()
+        return _wordnet_lemmatizer
+
+# Maximum number of points added for required skills found in the CV
+SKILL_BOOST = 30
+
+def match_summary(match):
+    """Plain-data view of a match_jobs result, safe to store or send between processes"""
+    job = match["job"]
+    return {
+        "id": job.id,
+        "title": job.title,
+        "location": job.location,
+        "company": job.company,
+        "match_score": match["match_score"],
+        "skills_matched": match["skills_matched"],
+        "skills_missing": match["skills_missing"]
+    }
+
+
+# Lowercased text is cleaned in one pass: punctuation and digits are deleted
+_STRIP_TABLE = str.maketrans('', '', string.punctuation + string.digits)
+
+
 class EnhancedMatcher:
-    def __init__(self):
-        self.lemmatizer = WordNetLemmatizer()
-        self.stop_words = set(stopwords.words('english'))
-        self.vectorizer = TfidfVectorizer(
-            stop_words='english',
-            max_features=1000,
-            ngram_range=(1, 2)
-        )
+    def __init__(self, refit_drift=0.2, lemma_cache_size=50000, job_text_cache_size=100000,
+                 ann_min_jobs=250000, ann_nprobe=32):
+        self.stop_words = ENGLISH_STOP_WORDS
         
+        # Lemmas of the same vocabulary words are looked up on every request
+        self.lemmatize = lru_cache(maxsize=lemma_cache_size)(self._lemmatize)
+        
+        # Preprocessed job documents, keyed by a hash of the raw document
+        self._job_text_cache = OrderedDict()
+        self._job_text_cache_size = job_text_cache_size
+        self._job_text_lock = threading.Lock()
+        self._job_text_hits = 0
+        self._job_text_misses = 0
+        
+        # Two-document fallback of calculate_match_score, created on first use
+        self._vectorizer = None
+        self.job_index = None
+        
+        # Skills and their aliases are found in one pass over the text, on word
+        # boundaries; the compiled taxonomy is shared by every matcher
+        self._taxonomy = None
+        
+        # Refit the index in the background once the IDF weights drift this far
+        self.refit_drift = refit_drift
+        self._index_lock = threading.Lock()
+        self._refit_thread = None
+        
+        # Approximate retrieval for catalogs of at least `ann_min_jobs` jobs: only
+        # the `ann_nprobe` closest clusters are scored (more probes = better recall)
+        self.ann_min_jobs = ann_min_jobs
+        self.ann_nprobe = ann_nprobe
+        
+        # Optional MatchCache for the vectors and scores of CVs seen before
+        self.cache = None
+        
+        # Optional IndexSnapshots shared with the other worker processes
+        self.snapshots = None
+        
+        # Job changes not in a saved snapshot yet, and whether a save is due.
+        # A freshly built index holds every job, it is saved as it is
+        self._unsaved = {}
+        self._save_pending = False
+        self._full_save = False
+        
+    @staticmethod
+    def _lemmatize(word):
+        return wordnet_lemmatizer().lemmatize(word)
+    
+    @property
+    def vectorizer(self):
+        if self._vectorizer is None:
+            self._vectorizer = make_vectorizer(max_features=1000)
+        return self._vectorizer
+    
     def preprocess_text(self, text):
         """Clean and preprocess text"""
         if not text:
             return ""
-            
-        # Convert to lowercase
-        text = text.lower()
         
-        # Remove punctuation
-        text = text.translate(str.maketrans('', '', string.punctuation))
+        # Lowercase, strip punctuation and numbers, then tokenize
+        tokens = text.lower().translate(_STRIP_TABLE).split()
+        
+        # Remove stopwords and lemmatize
+        stop_words = self.stop_words
+        lemmatize = self.lemmatize
+        return ' '.join([lemmatize(token) for token in tokens
+                         if len(token) > 2 and token not in stop_words])
+    
+    def preprocess_job_text(self, document):
+        """Preprocess a job document, memoized by a hash of its content"""
+        key = hashlib.blake2b(document.encode('utf-8'), digest_size=16).digest()
+        
+        with self._job_text_lock:
+            processed = self._job_text_cache.get(key)
+            if processed is not None:
+                self._job_text_cache.move_to_end(key)
+                self._job_text_hits += 1
+                return processed
+            self._job_text_misses += 1
         
-        # Remove numbers
-        text = re.sub(r'\d+', '', text)
+        processed = self.preprocess_text(document)
         
-        # Tokenize and remove stopwords
-        tokens = text.split()
-        tokens = [self.lemmatizer.lemmatize(token) for token in tokens 
-                 if token not in self.stop_words and len(token) > 2]
+        with self._job_text_lock:
+            self._job_text_cache[key] = processed
+            if len(self._job_text_cache) > self._job_text_cache_size:
+                self._job_text_cache.popitem(last=False)
         
-        return ' '.join(tokens)
+        return processed
     
-    def extract_skills(self, cv_text):
-        """Extract skills from CV text using keyword matching"""
-        # Common tech skills dictionary
-        tech_skills = {
-            'python', 'java', 'javascript', 'html', 'css', 'react', 'angular', 
-            'vue', 'node', 'express', 'django', 'flask', 'sql', 'mysql', 
-            'postgresql', 'mongodb', 'aws', 'azure', 'docker', 'kubernetes',
-            'git', 'linux', 'windows', 'excel', 'word', 'powerpoint', 'access',
-            'troubleshooting', 'networking', 'communication', 'leadership',
-            'teamwork', 'problem solving', 'data analysis', 'machine learning',
-            'ai', 'cybersecurity', 'cloud', 'devops', 'agile', 'scrum'
+    def cache_stats(self):
+        """Hit/miss counters for the lemma and job text caches"""
+        lemma = self.lemmatize.cache_info()
+        return {
+            "lemma_hits": lemma.hits,
+            "lemma_misses": lemma.misses,
+            "lemma_size": lemma.currsize,
+            "job_text_hits": self._job_text_hits,
+            "job_text_misses": self._job_text_misses,
+            "job_text_size": len(self._job_text_cache),
         }
+    
+    @property
+    def taxonomy(self):
+        if self._taxonomy is None:
+            self._taxonomy = default_taxonomy()
+        return self._taxonomy
+    
+    def extract_skills(self, cv_text):
+        """Extract the canonical skills of a CV text using the skill taxonomy"""
+        return self.taxonomy.extract(cv_text)
+    
+    def build_index(self, jobs):
+        """Fit the TF-IDF job index once over the whole catalog"""
+        job_index = JobIndex.build(jobs, self.preprocess_job_text)
+        self._maybe_build_ann(job_index)
+        with self._index_lock:
+            self.job_index = job_index
+            # Built from the database, so it already has every unsaved change
+            self._unsaved = {}
+            self._full_save = True
+        self._snapshot(job_index)
+        return job_index
+    
+    def update_index(self, changes):
+        """Apply committed job changes ({job_id: JobRecord or None}) to the index"""
+        with self._index_lock:
+            if self.job_index is None:
+                # Nothing fitted yet, the first match builds the index from scratch
+                return
+            
+            self._apply(self.job_index, changes)
+            if self.snapshots is not None:
+                self._unsaved.update(changes)
+            
+            drift = self.job_index.drift()
+            job_index = self.job_index
+        
+        self._snapshot(job_index)
+        if drift > self.refit_drift:
+            self.schedule_refit()
+    
+    def _apply(self, job_index, changes):
+        for job_id, record in changes.items():
+            if record is None:
+                job_index.remove(job_id)
+            else:
+                document = self.preprocess_job_text(job_document(record))
+                job_index.upsert(record, document)
+    
+    def schedule_refit(self):
+        """Refit vocabulary and IDF weights in a background thread"""
+        with self._index_lock:
+            if self.job_index is None or (self._refit_thread and self._refit_thread.is_alive()):
+                return
+            self._refit_thread = threading.Thread(target=self._refit, daemon=True)
+            self._refit_thread.start()
+    
+    def _refit(self):
+        with self._index_lock:
+            stale = self.job_index
+            records, documents = stale.begin_refit()
+        
+        # An index loaded from a snapshot has no documents for its rows yet
+        documents = [self.preprocess_job_text(job_document(record)) if document is None else document
+                     for record, document in zip(records, documents)]
+        
+        # Matching keeps using the stale index while the new one is fitted
+        fresh = JobIndex.fit(records, documents)
+        self._maybe_build_ann(fresh)
+        
+        with self._index_lock:
+            # A full rebuild may have replaced the index in the meantime
+            if self.job_index is not stale:
+                return
+            self.job_index = stale.finish_refit(fresh)
+        
+        self._snapshot(self.job_index)
+    
+    def _snapshot(self, job_index):
+        if self.snapshots is not None:
+            with self._index_lock:
+                self._save_pending = True
+            self.snapshots.save_later(self._save_snapshot)
+    
+    def _save_snapshot(self):
+        """Save the index as the current snapshot without losing other processes' jobs.
         
-        cv_text_lower = cv_text.lower()
-        found_skills = []
+        Each process only sees the job changes committed through its own
+        session. Under the snapshot writer lock, if another process saved a
+        snapshot since this one last loaded or saved, that snapshot is
+        loaded and only this process's unsaved changes are applied on top of
+        it before saving. A local refit is dropped in that case; the index is
+        refitted again once it drifts.
+        """
+        with self.snapshots.writer_lock():
+            with self._index_lock:
+                job_index, changes, full = self.job_index, self._unsaved, self._full_save
+                self._unsaved, self._full_save = {}, False
+            
+            if not full and self.snapshots.changed():
+                latest = self.snapshots.load()
+                if latest is not None:
+                    self._apply(latest, changes)
+                    with self._index_lock:
+                        # Changes committed meanwhile stay unsaved for the next run
+                        self._apply(latest, self._unsaved)
+                        self.job_index = latest
+                    job_index = latest
+            
+            self.snapshots.save(job_index)
         
-        for skill in tech_skills:
-            if skill in cv_text_lower:
-                found_skills.append(skill)
-                
-        return found_skills
+        with self._index_lock:
+            if not self._unsaved and not self._full_save:
+                self._save_pending = False
+    
+    def _maybe_build_ann(self, job_index):
+        if self.ann_nprobe and len(job_index) >= self.ann_min_jobs:
+            job_index.build_ann()
     
-    def calculate_match_score(self, cv_text, job_description):
-        """Calculate match score using TF-IDF and cosine similarity"""
+    def calculate_match_score(self, cv_text, job_description, processed_cv=None):
+        """Calculate match score using TF-IDF and cosine similarity.
+        
+        `processed_cv` can pass in the already preprocessed CV text.
+        """
         # Preprocess texts
-        processed_cv = self.preprocess_text(cv_text)
-        processed_job = self.preprocess_text(job_description)
+        if processed_cv is None:
+            processed_cv = self.preprocess_text(cv_text)
+        processed_job = self.preprocess_job_text(job_description)
         
         if not processed_cv or not processed_job:
             return 0.0
         
-        # Creates TF-IDF vectors
-        tfidf_matrix = self.vectorizer.fit_transform([processed_cv, processed_job])
+        if self.job_index is not None and self.job_index.vectorizer is not None:
+            # Reuse the catalog-wide vocabulary and IDF weights
+            tfidf_matrix = self.job_index.transform([processed_cv, processed_job])
+        else:
+            # No index yet, fall back to a two-document fit
+            tfidf_matrix = self.vectorizer.fit_transform([processed_cv, processed_job])
         
         # Calculates cosine similarity
+        from sklearn.metrics.pairwise import cosine_similarity
         similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])
         
         return similarity[0][0] * 100  # Convert to percentage
     
-    def match_jobs(self, cv_text, jobs, keyword=None, location=None):
-        """Match CV against multiple jobs"""
+    def ensure_index(self, load_jobs):
+        """Build the job index from `load_jobs()` unless it is already built.
+        
+        With snapshots, a newer snapshot saved by another process is mapped
+        in place of the current index, and a new process maps the latest
+        snapshot instead of fitting the index again. While this process has
+        changes to save, the snapshot writer merges them instead.
+        """
+        if self.snapshots is not None and (self.job_index is None or
+                                           (self.snapshots.changed() and not self._save_pending)):
+            job_index = self.snapshots.load()
+            if job_index is not None:
+                with self._index_lock:
+                    self.job_index = job_index
+        
+        if self.job_index is None:
+            self.build_index(load_jobs())
+        return self.job_index
+    
+    def match_jobs(self, cv_text, jobs=None, keyword=None, location=None, top_k=None, min_score=None,
+                   processed_cv=None, cv_skills=None, cv_key=None):
+        """Match CV against multiple jobs.
+        
+        Returns the best `top_k` jobs (all jobs when None) scoring at least
+        `min_score`, best match first. With `jobs=None` the whole indexed
+        catalog is searched and each result's "job" is its JobRecord.
+        `processed_cv` and `cv_skills` can pass in the already preprocessed
+        CV text and extracted skills; with a `cv_key` (see match_cache.cv_key)
+        the CV's scores are cached until the job index changes.
+        """
         results = []
-        cv_skills = self.extract_skills(cv_text)
-        
-        for job in jobs:
-            # Apply filters
-            if keyword and keyword.lower() not in job.title.lower():
-                continue
-                
-            if location and location.lower() not in job.location.lower():
-                continue
-            
-            # Create job description from title and required skills
-            job_description = f"{job.title} {job.required_skills}"
-            
-            # Add description if it exists
-            if hasattr(job, 'description') and job.description:
-                job_description += f" {job.description}"
-            
-            # Calculate match score
-            match_score = self.calculate_match_score(cv_text, job_description)
-            
-            # Extract job skills
-            job_skills = [skill.strip().lower() for skill in job.required_skills.split(',')]
-            
-            # Find matching and missing skills
-            skills_matched = [skill for skill in job_skills if skill in cv_skills]
-            skills_missing = [skill for skill in job_skills if skill not in cv_skills]
-            
-            # Boost score based on skill matches
-            skill_boost = len(skills_matched) / len(job_skills) * 30 if job_skills else 0
-            final_score = min(match_score + skill_boost, 100)
+        if cv_skills is None:
+            cv_skills = self.extract_skills(cv_text)
+        # Aliases resolve to their skill, and a skill also counts for its parent skills
+        cv_skills = self.taxonomy.expand(cv_skills)
+        
+        job_index, rows = self._index_rows(jobs)
+        if job_index is None:
+            return results
+        
+        # Apply filters through the title and location indexes
+        if keyword or location:
+            keep = job_index.filter_mask(keyword, location)[rows]
+            rows, jobs = self._keep(rows, jobs, keep)
+        
+        if processed_cv is None:
+            processed_cv = self.preprocess_text(cv_text)
+        
+        # On very large catalogs only re-score the candidates of the ANN index
+        narrowed = False
+        if self.ann_nprobe and len(rows) >= self.ann_min_jobs:
+            candidate_rows = job_index.ann_candidates(processed_cv, self.ann_nprobe)
+            if candidate_rows is not None:
+                is_candidate = np.zeros(len(job_index.alive), dtype=bool)
+                is_candidate[candidate_rows] = True
+                rows, jobs = self._keep(rows, jobs, is_candidate[rows])
+                narrowed = True
+        
+        if not len(rows) or (top_k is not None and top_k <= 0):
+            return results
+        
+        if self.cache is not None and cv_key is not None and not narrowed:
+            # Scores over the whole catalog are cached, the candidates are picked from them
+            tfidf_all, boost_all = self._catalog_scores(job_index, cv_key, processed_cv, cv_skills)
+            tfidf_scores, skill_boost = tfidf_all[rows], boost_all[rows]
+        else:
+            tfidf_scores, skill_boost = self._score_rows(job_index, processed_cv, cv_skills, rows)
+        return self._top_results(job_index, rows, jobs, tfidf_scores, skill_boost, cv_skills, top_k, min_score)
+    
+    def match_many(self, cv_texts, jobs=None, top_k=10, min_score=None, block_size=64):
+        """Match many CVs against the catalog (or against `jobs`).
+        
+        Yields one match_jobs-style result list per CV, in order. CVs are
+        scored `block_size` at a time: their vectors are stacked into one
+        sparse matrix and multiplied with the job matrix, so memory stays at
+        about block_size x jobs scores however many CVs there are.
+        """
+        job_index, rows = self._index_rows(jobs)
+        
+        # Scoring every live row needs no copy of the job matrix
+        score_rows = rows
+        if job_index is not None and jobs is None and len(rows) == len(job_index.alive):
+            score_rows = None
+        
+        block = []
+        for cv_text in cv_texts:
+            block.append(cv_text)
+            if len(block) >= block_size:
+                yield from self._match_block(job_index, rows, score_rows, jobs, block, top_k, min_score)
+                block = []
+        if block:
+            yield from self._match_block(job_index, rows, score_rows, jobs, block, top_k, min_score)
+    
+    def _match_block(self, job_index, rows, score_rows, jobs, cv_texts, top_k, min_score):
+        if job_index is None or not len(rows) or (top_k is not None and top_k <= 0):
+            for _ in cv_texts:
+                yield []
+            return
+        
+        processed_cvs = [self.preprocess_text(cv_text) for cv_text in cv_texts]
+        skill_sets = [self.taxonomy.expand(self.extract_skills(cv_text)) for cv_text in cv_texts]
+        
+        # One sparse matrix product each for the TF-IDF scores and the skill matches of the block
+        tfidf_scores = job_index.similarity_matrix(processed_cvs, score_rows) * 100
+        skills_matched = job_index.skill_match_matrix(skill_sets, score_rows)
+        skill_counts = job_index.skill_counts[rows]
+        
+        # A job appended between the products may be missing from one of them
+        n_rows = min(len(rows), tfidf_scores.shape[1], skills_matched.shape[1], len(skill_counts))
+        skill_counts = skill_counts[:n_rows]
+        skill_boost = np.divide(skills_matched[:, :n_rows] * SKILL_BOOST, skill_counts,
+                                out=np.zeros((len(cv_texts), n_rows)), where=skill_counts > 0)
+        
+        for i, cv_skills in enumerate(skill_sets):
+            yield self._top_results(job_index, rows[:n_rows], jobs, tfidf_scores[i, :n_rows],
+                                    skill_boost[i], cv_skills, top_k, min_score)
+    
+    def _index_rows(self, jobs):
+        """The job index and the rows to score: those of `jobs`, or every live row"""
+        if jobs is not None:
+            # Fit the index over the full catalog the first time we see it
+            if self.job_index is None or not self.job_index.covers(jobs):
+                self.build_index(jobs)
+            job_index = self.job_index
+            return job_index, job_index.rows_for(jobs)
+        
+        job_index = self.job_index
+        if job_index is None:
+            return None, np.zeros(0, dtype=np.int64)
+        return job_index, job_index.live_rows()
+    
+    @staticmethod
+    def _top_results(job_index, rows, jobs, tfidf_scores, skill_boost, cv_skills, top_k, min_score):
+        """Best `top_k` result dicts scoring at least `min_score`, best first"""
+        results = []
+        final_scores = np.minimum(tfidf_scores + skill_boost, 100)
+        match_scores = np.round(final_scores, 1)
+        
+        # Apply the minimum score cutoff
+        candidates = np.arange(len(rows))
+        if min_score is not None:
+            candidates = np.flatnonzero(match_scores >= min_score)
+        
+        # Select the winners in linear time, only they get sorted
+        if top_k is not None and top_k < len(candidates):
+            scores = match_scores[candidates]
+            cutoff = -np.partition(-scores, top_k - 1)[top_k - 1]
+            above = candidates[scores > cutoff]
+            ties = candidates[scores == cutoff][:top_k - len(above)]
+            candidates = np.concatenate([above, ties])
+        
+        # Best score first, ties keep the order of `jobs` (or of the catalog)
+        order = candidates[np.lexsort((candidates, -match_scores[candidates]))]
+        
+        # Only build result objects for the jobs that are returned
+        for position in order.tolist():
+            row = rows[position]
+            job_skills = job_index.job_skills[row]
             
             results.append({
-                "job": job,
-                "match_score": round(final_score, 1),
-                "skills_matched": skills_matched,
-                "skills_missing": skills_missing,
-                "tfidf_score": round(match_score, 1),
-                "skill_boost": round(skill_boost, 1)
+                "job": jobs[position] if jobs is not None else job_index.records[row],
+                "match_score": float(match_scores[position]),
+                "skills_matched": [skill for skill in job_skills if skill in cv_skills],
+                "skills_missing": [skill for skill in job_skills if skill not in cv_skills],
+                "tfidf_score": round(float(tfidf_scores[position]), 1),
+                "skill_boost": round(float(skill_boost[position]), 1)
             })
         
-        return sorted(results, key=lambda x: x["match_score"], reverse=True)
\ No newline at end of file
+        return results
+    
+    @staticmethod
+    def _score_rows(job_index, processed_cv, cv_skills, rows=None, cv_vector=None):
+        """TF-IDF scores and skill boosts of a CV for the given rows (all rows when None)"""
+        # Score the CV against the jobs with one sparse matrix-vector product
+        tfidf_scores = job_index.similarities(processed_cv, rows, cv_vector) * 100  # Convert to percentage
+        
+        # Boost score based on skill matches, for all jobs at once
+        skills_matched = job_index.skill_matches(cv_skills, rows)
+        skill_counts = job_index.skill_counts if rows is None else job_index.skill_counts[rows]
+        
+        # A job appended between the two products may be missing from one of them
+        n_rows = min(len(tfidf_scores), len(skills_matched), len(skill_counts))
+        tfidf_scores, skills_matched, skill_counts = (
+            tfidf_scores[:n_rows], skills_matched[:n_rows], skill_counts[:n_rows])
+        
+        skill_boost = np.divide(skills_matched * SKILL_BOOST, skill_counts,
+                                out=np.zeros_like(skill_counts), where=skill_counts > 0)
+        return tfidf_scores, skill_boost
+    
+    def _catalog_scores(self, job_index, cv_key, processed_cv, cv_skills):
+        """Scores of a CV against every row of the index, through the cache"""
+        index_version = job_index.index_version
+        scores = self.cache.get_scores(cv_key, index_version)
+        if scores is not None:
+            return scores
+        
+        # The CV vector only depends on the vocabulary, it survives job upserts
+        cv_vector = self.cache.get_vector(cv_key, job_index.fit_id)
+        if cv_vector is None:
+            cv_vector = job_index.transform([processed_cv])
+            self.cache.put_vector(cv_key, job_index.fit_id, cv_vector)
+        
+        scores = self._score_rows(job_index, processed_cv, cv_skills, cv_vector=cv_vector)
+        self.cache.put_scores(cv_key, index_version, scores)
+        return scores
+    
+    @staticmethod
+    def _keep(rows, jobs, keep):
+        """Narrow the candidate rows (and the matching jobs) to a boolean mask"""
+        if jobs is not None:
+            jobs = [job for job, kept in zip(jobs, keep.tolist()) if kept]
+        return rows[keep], jobs
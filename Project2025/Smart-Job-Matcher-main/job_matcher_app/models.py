@@ -2,9 +2,15 @@
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import json
+
+from history_codec import decode_matches
 
 db = SQLAlchemy()
 
+# How many of a user's most often missing skills UserStats keeps counting
+TRACKED_MISSING_SKILLS = 50
+
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -17,10 +23,12 @@ class User(db.Model):
     location = db.Column(db.String(200))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime)
+    is_admin = db.Column(db.Boolean, default=False)  # May see other users as job candidates
     
     # Relationships
     skills = db.relationship('UserSkill', backref='user', lazy=True)
     matches = db.relationship('JobMatch', backref='user', lazy=True)
+    match_runs = db.relationship('MatchRun', backref='user', lazy='dynamic')
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -32,21 +40,34 @@ class User(db.Model):
     def update_login_time(self):
         self.last_login = datetime.utcnow()
         
+class Skill(db.Model):
+    """Shared dictionary of skills, keyed by their lowercase name"""
+    __tablename__ = 'skills'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+
 class UserSkill(db.Model):
     __tablename__ = 'user_skills'
+    __table_args__ = (
+        db.Index('ux_user_skills_user_skill', 'user_id', 'skill_id', unique=True),
+        db.Index('ix_user_skills_skill', 'skill_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    skill_name = db.Column(db.String(100), nullable=False)
+    skill_id = db.Column(db.Integer, db.ForeignKey('skills.id'))
+    skill_name = db.Column(db.String(100), nullable=False)  # As the user typed it
     proficiency = db.Column(db.Integer, default=1)  # 1-5 scale
 
 class Job(db.Model):
     __tablename__ = 'jobs'
     
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
+    external_id = db.Column(db.String(200), unique=True, index=True)  # Key of the job in its feed
+    title = db.Column(db.String(200), nullable=False, index=True)
     company = db.Column(db.String(200))
-    location = db.Column(db.String(200))
+    location = db.Column(db.String(200), index=True)
     description = db.Column(db.Text)
     required_skills = db.Column(db.Text)  # Comma-separated skills
     
@@ -55,6 +76,9 @@ class Job(db.Model):
 
 class JobMatch(db.Model):
     __tablename__ = 'job_matches'
+    __table_args__ = (
+        db.Index('ix_job_matches_user_matched_on', 'user_id', 'matched_on'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -65,4 +89,101 @@ class JobMatch(db.Model):
     
     # Additional match details
     skills_matched = db.Column(db.Text)  # Comma-separated list
-    skills_missing = db.Column(db.Text)  # Comma-separated list
\ No newline at end of file
+    skills_missing = db.Column(db.Text)  # Comma-separated list
+
+class MatchRun(db.Model):
+    """One CV upload and its matches, packed by history_codec.encode_matches"""
+    __tablename__ = 'match_runs'
+    __table_args__ = (
+        db.Index('ix_match_runs_user_matched_on', 'user_id', 'matched_on', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    matched_on = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    cv_filename = db.Column(db.String(200))
+    n_matches = db.Column(db.Integer, nullable=False, default=0)
+    best_score = db.Column(db.Float)
+    
+    # Packed results, best match first
+    job_ids = db.Column(db.LargeBinary)  # little-endian uint32 per match
+    scores = db.Column(db.LargeBinary)  # little-endian uint16 per match, tenths of a percent
+    skills = db.Column(db.Text)  # Comma-separated skills referenced by skill_bits
+    skill_bits = db.Column(db.LargeBinary)  # Per match: matched and missing bitsets over skills
+    
+    def matches(self):
+        return decode_matches(self.job_ids, self.scores, self.skills, self.skill_bits)
+
+class UserStats(db.Model):
+    """Per-user match counters, updated as match runs are written"""
+    __tablename__ = 'user_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    total_runs = db.Column(db.Integer, nullable=False, default=0)
+    total_matches = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0)
+    best_score = db.Column(db.Float)
+    last_run_at = db.Column(db.DateTime)
+    last_cv_filename = db.Column(db.String(200))
+    
+    # JSON object of skill -> number of matches it was missing from, for the
+    # TRACKED_MISSING_SKILLS most frequent skills only
+    missing_skills = db.Column(db.Text)
+    
+    def record(self, matched_on, cv_filename, matches):
+        """Add one upload's matches (dicts with "match_score" and "skills_missing")"""
+        self.total_runs = (self.total_runs or 0) + 1
+        self.total_matches = (self.total_matches or 0) + len(matches)
+        self.score_sum = (self.score_sum or 0) + sum(match["match_score"] for match in matches)
+        
+        best = max((match["match_score"] for match in matches), default=None)
+        if best is not None and (self.best_score is None or best > self.best_score):
+            self.best_score = best
+        
+        if self.last_run_at is None or matched_on >= self.last_run_at:
+            self.last_run_at = matched_on
+            self.last_cv_filename = cv_filename
+        
+        counts = json.loads(self.missing_skills) if self.missing_skills else {}
+        for match in matches:
+            for skill in match["skills_missing"]:
+                counts[skill] = counts.get(skill, 0) + 1
+        top = sorted(counts.items(), key=lambda item: -item[1])[:TRACKED_MISSING_SKILLS]
+        self.missing_skills = json.dumps(dict(top))
+    
+    def to_dict(self, top_skills=5):
+        counts = json.loads(self.missing_skills) if self.missing_skills else {}
+        return {
+            "total_runs": self.total_runs or 0,
+            "total_matches": self.total_matches or 0,
+            "average_score": round(self.score_sum / self.total_matches, 1) if self.total_matches else None,
+            "best_score": self.best_score,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_cv_filename": self.last_cv_filename,
+            "top_missing_skills": sorted(counts, key=lambda skill: -counts[skill])[:top_skills]
+        }
+
+class MatchTask(db.Model):
+    __tablename__ = 'match_tasks'
+    
+    id = db.Column(db.String(32), primary_key=True)  # Ticket handed to the client
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, done, failed
+    cv_filename = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    # JSON list of matches once done, or the reason it failed
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    
+    def to_dict(self):
+        return {
+            "ticket": self.id,
+            "status": self.status,
+            "cv_filename": self.cv_filename,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "results": json.loads(self.result) if self.result else None,
+            "error": self.error
+        }
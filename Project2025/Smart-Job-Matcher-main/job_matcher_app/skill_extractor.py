@@ -0,0 +1,98 @@
+# skill_extractor.py
+import re
+from collections import deque
+
+# Words of a skill or of a CV: keeps "c++", "c#" and "node.js" in one piece,
+# everything else (spaces, commas, hyphens, slashes...) separates words
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9+#]+)*")
+
+
+def tokenize(text):
+    """Split text into lowercase skill words"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class SkillExtractor:
+    """Aho-Corasick automaton over skill words.
+
+    Skills are compiled once into a trie of words with failure links, so all
+    skills of a taxonomy - including multi-word ones like 'machine learning' -
+    are found in a single pass over the text. Matching works on whole words,
+    so 'ai' does not match inside 'email' and 'java' not inside 'javascript'.
+    """
+
+    def __init__(self, skills):
+        # `skills` is an iterable of skill names or a {pattern: label} mapping
+        if not hasattr(skills, 'items'):
+            skills = {skill: skill for skill in skills}
+
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        self._size = 0
+
+        for pattern, label in skills.items():
+            self._add(tokenize(pattern), label)
+
+        self._build_failure_links()
+
+    def __len__(self):
+        return self._size
+
+    def _add(self, words, label):
+        if not words:
+            return
+
+        node = 0
+        for word in words:
+            next_node = self._goto[node].get(word)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][word] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            node = next_node
+
+        if label not in self._output[node]:
+            self._output[node] += (label,)
+            self._size += 1
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            node = queue.popleft()
+            for word, child in self._goto[node].items():
+                queue.append(child)
+
+                # Longest proper suffix of the child's word path that is in the trie
+                fallback = self._fail[node]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(word, 0)
+
+                # A match here also completes every skill ending at the fallback
+                self._output[child] += tuple(
+                    label for label in self._output[self._fail[child]]
+                    if label not in self._output[child]
+                )
+
+    def iter_matches(self, text):
+        """Yield the label of every skill occurrence in the text"""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+
+        for word in tokenize(text):
+            while node and word not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(word, 0)
+
+            if output[node]:
+                yield from output[node]
+
+    def extract(self, text):
+        """Distinct skills found in the text, in order of first occurrence"""
+        if not text:
+            return []
+        return list(dict.fromkeys(self.iter_matches(text)))
@@ -0,0 +1,154 @@
+# skill_taxonomy.py
+import hashlib
+import json
+import os
+import threading
+
+from skill_extractor import SkillExtractor, tokenize
+
+# Taxonomy loaded by default_taxonomy(), SKILL_TAXONOMY_PATH overrides it
+TAXONOMY_PATH = os.path.join(os.path.dirname(__file__), "data", "skill_taxonomy.json")
+
+_default_taxonomy = None
+_default_version = None
+_default_lock = threading.Lock()
+
+
+def skill_key(name):
+    """Lookup key of a skill name: its lowercase skill words, space separated"""
+    return " ".join(tokenize(name or ""))
+
+
+def _squashed(key):
+    # "power bi", "power-bi" and "powerbi" all squash to "powerbi"
+    return key.replace(" ", "")
+
+
+class SkillTaxonomy:
+    """Canonical skills with their aliases and parent skills.
+
+    `entries` are dicts with an "id" (the canonical, lowercase skill name),
+    optional "aliases" and optional "parents" (ids of broader skills, e.g.
+    postgresql -> sql). They are compiled once into a dict from every
+    spelling to its id, and into an Aho-Corasick automaton that finds the
+    canonical skills of a whole text in one pass.
+
+    Names that are not in the taxonomy are their own canonical id, so any
+    two spellings of an unknown skill that differ only in case, spacing or
+    punctuation still compare equal.
+    """
+
+    def __init__(self, entries):
+        self._lookup = {}
+        self._squashed = {}
+        self._parents = {}
+
+        # Spellings of each skill as listed, canonical id first
+        self.aliases = {}
+
+        patterns = {}
+        for entry in entries:
+            skill_id = skill_key(entry["id"])
+            self._parents.setdefault(skill_id, set()).update(
+                skill_key(parent) for parent in entry.get("parents", ()))
+            for name in [entry["id"]] + list(entry.get("aliases", ())):
+                key = skill_key(name)
+                if not key:
+                    continue
+                self.aliases.setdefault(skill_id, []).append(name)
+                self._lookup.setdefault(key, skill_id)
+                patterns.setdefault(key, skill_id)
+                # Multi-word skills are also found written as one word
+                if " " in key:
+                    patterns.setdefault(_squashed(key), skill_id)
+
+        # Squashed spellings only resolve when they are not a skill of their own
+        for key, skill_id in self._lookup.items():
+            self._squashed.setdefault(_squashed(key), skill_id)
+
+        self._ancestors = {skill_id: self._closure(skill_id) for skill_id in self._parents}
+        self.extractor = SkillExtractor(patterns)
+
+    def _closure(self, skill_id):
+        ancestors, pending = set(), list(self._parents.get(skill_id, ()))
+        while pending:
+            parent = pending.pop()
+            if parent not in ancestors and parent != skill_id:
+                ancestors.add(parent)
+                pending.extend(self._parents.get(parent, ()))
+        return frozenset(ancestors)
+
+    @classmethod
+    def load(cls, path):
+        """Compile the taxonomy of a JSON file: {"skills": [entries...]}"""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["skills"])
+
+    def __len__(self):
+        return len(self._parents)
+
+    def __contains__(self, name):
+        return self.canonical(name) in self._parents
+
+    def canonical(self, name):
+        """Canonical id of a skill name or alias"""
+        key = skill_key(name)
+        skill_id = self._lookup.get(key)
+        if skill_id is None:
+            skill_id = self._squashed.get(_squashed(key), key)
+        return skill_id
+
+    def canonicalize(self, names):
+        """Distinct canonical ids of skill names, in order of first appearance"""
+        canonical = self.canonical
+        return tuple(dict.fromkeys(skill_id for skill_id in map(canonical, names) if skill_id))
+
+    def ancestors(self, skill_id):
+        """Broader skills implied by a canonical skill, transitively"""
+        return self._ancestors.get(skill_id, frozenset())
+
+    def expand(self, names):
+        """Set of canonical ids of skill names plus every skill they imply"""
+        skills = set(self.canonicalize(names))
+        for skill_id in list(skills):
+            skills |= self.ancestors(skill_id)
+        return skills
+
+    def extract(self, text):
+        """Canonical skills mentioned in a text, in order of first occurrence"""
+        return self.extractor.extract(text)
+
+
+def default_taxonomy():
+    """Shared taxonomy of every matcher in the process, compiled on first use"""
+    global _default_taxonomy
+    if _default_taxonomy is not None:
+        return _default_taxonomy
+
+    with _default_lock:
+        if _default_taxonomy is None:
+            _default_taxonomy = SkillTaxonomy.load(taxonomy_path())
+        return _default_taxonomy
+
+
+def taxonomy_path():
+    """File of the default taxonomy"""
+    return os.getenv('SKILL_TAXONOMY_PATH') or TAXONOMY_PATH
+
+
+def taxonomy_version():
+    """Hash of the default taxonomy file, changes whenever a skill is renamed or re-aliased.
+
+    Skills extracted or stored under another version may use ids the
+    taxonomy no longer has. Only the file is hashed, nothing is compiled.
+    """
+    global _default_version
+    if _default_version is None:
+        with open(taxonomy_path(), "rb") as f:
+            _default_version = hashlib.sha256(f.read()).hexdigest()[:16]
+    return _default_version
+
+
+def canonical_skills(names):
+    """Distinct canonical ids of skill names in the default taxonomy"""
+    return default_taxonomy().canonicalize(names)
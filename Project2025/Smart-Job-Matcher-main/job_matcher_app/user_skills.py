@@ -0,0 +1,169 @@
+# user_skills.py
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Skill, UserSkill
+from skill_taxonomy import default_taxonomy
+
+# Skill names looked up per SELECT, below SQLite's bound parameter limit
+_LOOKUP_SIZE = 500
+
+
+def normalize_skill(name):
+    """Dictionary key of a skill name: its canonical id in the skill taxonomy"""
+    return default_taxonomy().canonical(name)
+
+
+def skill_ids(names, create=False):
+    """Map skill names to their integer ids in the skills table.
+
+    Names are normalized first and the result is keyed by normalized name.
+    With `create` missing skills are inserted with one executemany INSERT,
+    otherwise they are left out of the result.
+    """
+    names = list(dict.fromkeys(name for name in map(normalize_skill, names) if name))
+    ids = {}
+    for start in range(0, len(names), _LOOKUP_SIZE):
+        ids.update(db.session.execute(
+            db.select(Skill.name, Skill.id).where(Skill.name.in_(names[start:start + _LOOKUP_SIZE]))
+        ).all())
+
+    missing = [name for name in names if name not in ids]
+    if create and missing:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(Skill.__table__.insert(), [{"name": name} for name in missing])
+        except IntegrityError:
+            # Another request added some of them first, their ids are read below
+            pass
+        for start in range(0, len(missing), _LOOKUP_SIZE):
+            ids.update(db.session.execute(
+                db.select(Skill.name, Skill.id).where(Skill.name.in_(missing[start:start + _LOOKUP_SIZE]))
+            ).all())
+    return ids
+
+
+def sync_user_skills(user_id, names, proficiency=None):
+    """Make a user's skills exactly `names`, in the caller's transaction.
+
+    Only the difference to the stored skills is written: one DELETE for the
+    skills dropped and one executemany INSERT for the skills added. Skills
+    kept keep their proficiency. Returns the user's skills as a dict of
+    skill id to proficiency.
+    """
+    wanted = {}
+    for name in names:
+        key = normalize_skill(name)
+        if key and key not in wanted:
+            wanted[key] = name.strip()
+    ids = skill_ids(wanted, create=True)
+    wanted_ids = {ids[key]: spelling for key, spelling in wanted.items()}
+
+    table = UserSkill.__table__
+    existing = dict(db.session.execute(
+        db.select(table.c.skill_id, table.c.proficiency).where(table.c.user_id == user_id)
+    ).all())
+
+    removed = [skill_id for skill_id in existing if skill_id not in wanted_ids]
+    if removed:
+        db.session.execute(table.delete().where(table.c.user_id == user_id)
+                           .where(table.c.skill_id.in_(removed)))
+
+    added = [{"user_id": user_id, "skill_id": skill_id, "skill_name": spelling, "proficiency": proficiency or 1}
+             for skill_id, spelling in wanted_ids.items() if skill_id not in existing]
+    if added:
+        db.session.execute(table.insert(), added)
+
+    skills = {skill_id: existing[skill_id] for skill_id in wanted_ids if skill_id in existing}
+    skills.update((row["skill_id"], row["proficiency"]) for row in added)
+    return skills
+
+
+def ensure_skill_ids():
+    """Link the user_skills rows of older databases to the skills table.
+
+    Adds the user_skills.skill_id column and its indexes, fills it in from
+    skill_name and drops rows that repeat a skill of the same user. Returns
+    the number of rows linked.
+    """
+    columns = {column["name"] for column in inspect(db.engine).get_columns(UserSkill.__tablename__)}
+    if "skill_id" not in columns:
+        with db.engine.begin() as connection:
+            connection.execute(text("ALTER TABLE user_skills ADD COLUMN skill_id INTEGER REFERENCES skills(id)"))
+
+    table = UserSkill.__table__
+    rows = db.session.execute(
+        db.select(table.c.id, table.c.user_id, table.c.skill_id, table.c.skill_name).order_by(table.c.id)
+    ).all()
+    ids = skill_ids([row.skill_name for row in rows if row.skill_id is None], create=True)
+
+    seen = {(row.user_id, row.skill_id) for row in rows if row.skill_id is not None}
+    updates, duplicates = [], []
+    for row in rows:
+        if row.skill_id is not None:
+            continue
+        skill_id = ids.get(normalize_skill(row.skill_name))
+        if skill_id is None or (row.user_id, skill_id) in seen:
+            duplicates.append(row.id)
+        else:
+            seen.add((row.user_id, skill_id))
+            updates.append({"row_id": row.id, "new_skill_id": skill_id})
+
+    for start in range(0, len(duplicates), _LOOKUP_SIZE):
+        db.session.execute(table.delete().where(table.c.id.in_(duplicates[start:start + _LOOKUP_SIZE])))
+    if updates:
+        db.session.execute(table.update().where(table.c.id == bindparam("row_id"))
+                           .values(skill_id=bindparam("new_skill_id")), updates)
+    db.session.commit()
+
+    for index in table.indexes:
+        index.create(db.engine, checkfirst=True)
+    return len(updates)
+
+
+def rekey_skills():
+    """Point user_skills at the canonical skills of the current taxonomy.
+
+    Run after aliases were removed or renamed in the taxonomy: every row is
+    re-keyed from its skill_name, rows that now repeat a skill of the same
+    user are dropped and skills no user has any more are deleted. Returns
+    the number of rows re-keyed.
+    """
+    table = UserSkill.__table__
+    rows = db.session.execute(
+        db.select(table.c.id, table.c.user_id, table.c.skill_id, table.c.skill_name).order_by(table.c.id)
+    ).all()
+    ids = skill_ids([row.skill_name for row in rows], create=True)
+
+    targets = {}
+    for row in rows:
+        targets[row.id] = ids.get(normalize_skill(row.skill_name), row.skill_id)
+
+    # Rows keeping their skill are seen first, so a re-keyed row never displaces one
+    seen = {(row.user_id, row.skill_id) for row in rows if targets[row.id] == row.skill_id}
+    updates, duplicates = [], []
+    for row in rows:
+        skill_id = targets[row.id]
+        if skill_id == row.skill_id:
+            continue
+        if (row.user_id, skill_id) in seen:
+            duplicates.append(row.id)
+        else:
+            seen.add((row.user_id, skill_id))
+            updates.append({"row_id": row.id, "new_skill_id": skill_id})
+
+    for start in range(0, len(duplicates), _LOOKUP_SIZE):
+        db.session.execute(table.delete().where(table.c.id.in_(duplicates[start:start + _LOOKUP_SIZE])))
+    if updates:
+        # Unlinked first, so swapping two skills of a user never trips the unique index
+        moved = [update["row_id"] for update in updates]
+        for start in range(0, len(moved), _LOOKUP_SIZE):
+            db.session.execute(table.update().where(table.c.id.in_(moved[start:start + _LOOKUP_SIZE]))
+                               .values(skill_id=None))
+        db.session.execute(table.update().where(table.c.id == bindparam("row_id"))
+                           .values(skill_id=bindparam("new_skill_id")), updates)
+
+    used = db.select(table.c.skill_id).where(table.c.skill_id.isnot(None))
+    db.session.execute(Skill.__table__.delete().where(Skill.__table__.c.id.not_in(used)))
+    db.session.commit()
+    return len(updates)